@@ -0,0 +1,334 @@
+"""Pegasus benchmarks
+
+Measures parse throughput (MB/s and documents/s) and peak memory of the JSON
+grammar from the tests over corpora of different shapes, next to the stdlib json
+module, along with keyword/repetition stress grammars and per-combinator
+microbenchmarks. Every case runs in a process of its own, building only its own
+corpus and grammar, and its peak memory is how far its max RSS grew past what it
+was just before parsing.
+
+    python bench/benchmark.py --output results.json
+    python bench/benchmark.py --quick --compare results.json
+
+With --compare, cases whose throughput dropped, or whose peak memory grew, by more
+than --threshold compared to an earlier results file are listed and the exit
+status is 1.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import traceback
+from timeit import default_timer as clock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'test'), os.path.dirname(os.path.abspath(__file__))]
+
+import pegasus
+from pegasus.codegen import compile_grammar
+from pegasus.rules import compile_rule
+from grammars import COMBINATORS, KEYWORDS, CombinatorParser, KeywordParser, RepetitionParser
+from test_json import JsonParser
+
+
+def _words(rng, count):
+    return [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+            for _ in range(count)]
+
+
+def json_corpora(scale):
+    """Synthetic JSON documents of different shapes, `scale` roughly being their size in KB
+
+    Returns a {name: function} dict; calling a function builds its document.
+    """
+    def records(count):
+        rng = random.Random(1)
+        return [{'id': i, 'name': ' '.join(_words(rng, 2)), 'score': rng.random() * 100,
+                 'active': rng.random() > 0.5, 'tags': _words(rng, rng.randint(0, 4))} for i in range(count)]
+
+    def nested(depth):
+        value = [1, 'x']
+        for i in range(depth):
+            value = {'level': i, 'child': value} if i % 2 else [value, i]
+        return value
+
+    def long_arrays():
+        rng = random.Random(3)
+        return json.dumps([[rng.randint(0, 10 ** 6) for _ in range(scale * 25)] for _ in range(4)])
+
+    def long_strings():
+        rng = random.Random(4)
+        return json.dumps([' '.join(_words(rng, scale * 20)) for _ in range(4)])
+
+    return {
+        'records': lambda: json.dumps(records(scale * 10)),
+        'deep_nesting': lambda: json.dumps([nested(40) for _ in range(max(1, scale // 2))]),
+        'long_arrays': long_arrays,
+        'long_strings': long_strings,
+        'whitespace': lambda: json.dumps(records(max(1, scale * 2)), indent=8, separators=(' ,  ', ' :  ')),
+    }
+
+
+def stress_corpora(scale):
+    """Inputs for the stress grammars, as a {name: function} dict like json_corpora()"""
+    def keywords():
+        rng = random.Random(2)
+        return ' '.join(rng.choice(KEYWORDS) for _ in range(scale * 200))
+
+    def char_runs():
+        rng = random.Random(5)
+        return ' '.join(''.join(rng.choice('ab') for _ in range(rng.randint(1, 40))) for _ in range(scale * 30))
+
+    def nested_runs():
+        rng = random.Random(6)
+        return ''.join('(' + 'x' * rng.randint(0, 20) + ')' for _ in range(scale * 80))
+
+    def sequences():
+        rng = random.Random(7)
+        return ''.join(rng.choice(['ab', 'abc']) for _ in range(scale * 300))
+
+    return {'keywords': keywords, 'char_runs': char_runs, 'nested_runs': nested_runs, 'sequences': sequences}
+
+
+def cases(scale):
+    """Yields (group, name, engine, build) for every benchmark
+
+    Nothing is built up front: build() returns the (text, function) to time,
+    building the corpus and compiling the grammar of that one case.
+    """
+    def engines():
+        parser = JsonParser()
+        compile_rule(JsonParser.document)
+        return {
+            'pegasus': lambda text: parser.parse(JsonParser.document, text, engine='indexed'),
+            'pegasus-bytes': lambda text: parser.parse(
+                JsonParser.document, bytearray(text.encode('utf-8')), engine='indexed'),
+            'pegasus-packrat': lambda text: parser.parse(JsonParser.document, text, packrat=True, engine='indexed'),
+            'pegasus-stream': lambda text: parser.parse(JsonParser.document, iter(text)),
+            'json': json.loads,
+        }
+
+    def codegen():
+        grammar = compile_grammar(JsonParser)
+        parser = JsonParser()
+        return lambda text: grammar.parse(parser, 'document', text)
+
+    def build(corpus, function):
+        return lambda: (corpus(), function())
+
+    engine_names = ['pegasus', 'pegasus-bytes', 'pegasus-packrat', 'pegasus-codegen', 'pegasus-stream', 'json']
+    for name, corpus in sorted(json_corpora(scale).items()):
+        for engine in engine_names:
+            function = codegen if engine == 'pegasus-codegen' else (lambda engine=engine: engines()[engine])
+            yield 'json', name, engine, build(corpus, function)
+
+    stress = stress_corpora(scale)
+    for parser_class in [KeywordParser, RepetitionParser]:
+        for name in sorted(stress):
+            rule = getattr(parser_class, name, None)
+            if rule is not None:
+                runner = lambda parser_class=parser_class, rule=rule: _runner(parser_class, rule)
+                yield 'stress', name, 'pegasus', build(stress[name], runner)
+
+    for name, unit in sorted(COMBINATORS.items()):
+        text = lambda unit=unit: unit * (scale * 300 // len(unit))
+        runner = lambda name=name: _runner(CombinatorParser, getattr(CombinatorParser, name))
+        yield 'combinator', name, 'pegasus', build(text, runner)
+
+
+def _runner(parser_class, rule):
+    parser = parser_class()
+    compile_rule(rule)
+    return lambda text: parser.parse(rule, text, engine='indexed')
+
+
+def measure(text, fn, repeat, budget):
+    """Times fn(text), returning the best time of `repeat` runs (fewer if over `budget` seconds)"""
+    fn(text)  # warm up
+
+    best = None
+    spent = 0.0
+    for _ in range(repeat):
+        start = clock()
+        fn(text)
+        elapsed = clock() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        if spent > budget:
+            break
+
+    return best
+
+
+def run_case(case, repeat, budget):
+    group, name, engine, build = case
+    text, fn = build()
+
+    base = _reset_peak_rss()
+    seconds = measure(text, fn, repeat, budget)
+    size = len(text.encode('utf-8'))
+    return {
+        'group': group,
+        'case': name,
+        'engine': engine,
+        'bytes': size,
+        'seconds': seconds,
+        'mb_per_s': size / seconds / 1e6 if seconds else None,
+        'docs_per_s': 1 / seconds if seconds else None,
+        # in KB, above what it was before parsing
+        'peak_rss': max(0, _peak_rss() - base),
+    }
+
+
+def _peak_rss():
+    """The max RSS of the process in KB (since the last _reset_peak_rss(), on Linux)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _reset_peak_rss():
+    """Resets the max RSS to the current RSS where possible (Linux), returning it
+
+    Elsewhere the max RSS can't be reset, so it's returned as is, and only growth
+    past it is measured.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        pass
+    return _peak_rss()
+
+
+def _isolated(index, scale, repeat, budget, queue):
+    try:
+        case = next(itertools.islice(cases(scale), index, None))
+        queue.put(run_case(case, repeat, budget))
+    except Exception:
+        queue.put({'error': traceback.format_exc()})
+
+
+def run(scale=10, repeat=5, budget=2.0, isolate=True, select=None, log=None):
+    """Runs the benchmarks, returning their results as a list of dicts"""
+    results = []
+    for index, case in enumerate(cases(scale)):
+        group, name, engine = case[:3]
+        if select is not None and not any(s in '{}/{}/{}'.format(group, name, engine) for s in select):
+            continue
+
+        if isolate:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_isolated, args=(index, scale, repeat, budget, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            if 'error' in result:
+                raise RuntimeError('benchmark {}/{}/{} failed:\n{}'.format(group, name, engine, result['error']))
+        else:
+            result = run_case(case, repeat, budget)
+
+        results.append(result)
+        if log is not None:
+            log('{group:>10} {case:>14} {engine:>16} {mb_per_s:>8.3f} MB/s {docs_per_s:>10.1f} docs/s '
+                '{peak_rss:>10} KB peak RSS'.format(**result))
+
+    return results
+
+
+def report(results, scale):
+    return {
+        'pegasus': pegasus.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'scale': scale,
+        'results': results,
+    }
+
+
+# peak memory growth below this (in KB) is taken to be noise
+RSS_NOISE = 1024
+
+
+def compare(results, baseline, threshold):
+    """Returns (key, measure, old, new) for every case that got slower, or whose peak
+    memory grew, by more than `threshold`
+
+    `measure` is 'mb_per_s' or 'peak_rss'.
+    """
+    def key(result):
+        return result['group'], result['case'], result['engine']
+
+    old = dict((key(result), result) for result in baseline['results'])
+    regressions = []
+    for result in results:
+        previous = old.get(key(result))
+        if previous is None:
+            continue
+
+        name = '/'.join(key(result))
+        if previous['mb_per_s'] and result['mb_per_s'] and \
+                result['mb_per_s'] < previous['mb_per_s'] * (1 - threshold):
+            regressions.append((name, 'mb_per_s', previous['mb_per_s'], result['mb_per_s']))
+
+        before, after = previous.get('peak_rss'), result.get('peak_rss')
+        if before is not None and after is not None and after > before * (1 + threshold) + RSS_NOISE:
+            regressions.append((name, 'peak_rss', before, after))
+    return regressions
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--scale', type=int, default=10, help='corpus size factor (roughly KB per document)')
+    args.add_argument('--quick', action='store_true', help='small corpora and few repeats')
+    args.add_argument('--repeat', type=int, default=5, help='timed runs per case (the best one counts)')
+    args.add_argument('--select', action='append', help='only run cases matching group/case/engine substrings')
+    args.add_argument('--output', help='write the results to this JSON file')
+    args.add_argument('--compare', help='compare against an earlier results file')
+    args.add_argument('--threshold', type=float, default=0.1, help='slowdown ratio flagged as a regression')
+    args = args.parse_args(argv)
+
+    scale, repeat = (2, 2) if args.quick else (args.scale, args.repeat)
+    results = run(scale, repeat, select=args.select, log=print)
+    data = report(results, scale)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.threshold)
+        for key, measure, before, after in regressions:
+            if measure == 'peak_rss':
+                print('regression: {} {} -> {} KB peak RSS'.format(key, before, after))
+            else:
+                print('regression: {} {:.3f} -> {:.3f} MB/s'.format(key, before, after))
+        if len(regressions):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
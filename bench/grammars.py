@@ -0,0 +1,90 @@
+"""Grammars for the benchmarks that don't come from the tests"""
+from __future__ import unicode_literals
+
+from pegasus import Parser, rule
+from pegasus.rules import ChrRange as C, Capture, Discard as _, In, Opt, Plus, Star, Str
+
+
+KEYWORDS = ['and', 'as', 'assert', 'break', 'class', 'continue', 'def', 'del', 'elif', 'else', 'except',
+            'exec', 'finally', 'for', 'from', 'global', 'if', 'import', 'in', 'is', 'lambda', 'not', 'or',
+            'pass', 'print', 'raise', 'return', 'try', 'while', 'with', 'yield']
+
+
+class KeywordParser(Parser):
+    """Long alternations of keywords sharing prefixes"""
+    # ordered choice; longer keywords have to come before their prefixes
+    @rule(sorted(KEYWORDS, key=len, reverse=True))
+    def keyword(self, word):
+        return word
+
+    @rule(Plus(keyword, _(Star(In(' \n')))))
+    def keywords(self, *words):
+        return len(words)
+
+
+class RepetitionParser(Parser):
+    """Plus/Star over single characters, sequences and nested repetitions"""
+    @rule(Plus(Str(Plus(In('ab'))), _(Star(' '))))
+    def char_runs(self, *runs):
+        return len(runs)
+
+    @rule(Plus('(', Star('x'), ')'))
+    def nested_runs(self, *groups):
+        return len(groups)
+
+    @rule(Star('ab', Opt('c')))
+    def sequences(self, *items):
+        return len(items)
+
+
+class CombinatorParser(Parser):
+    """One rule per combinator, each repeated over the whole input"""
+    @rule(Plus('abc'))
+    def literal(self, *_):
+        return True
+
+    @rule(Plus(C['a':'z'], _(' ')))
+    def chr_range(self, *_):
+        return True
+
+    @rule(Plus(In('xyz'), _(',')))
+    def one_of(self, *_):
+        return True
+
+    @rule(Plus(['foo', 'bar', 'baz']))
+    def ordered_choice(self, *_):
+        return True
+
+    @rule(Plus('a', 'b', 'c'))
+    def sequence(self, *_):
+        return True
+
+    @rule(Plus('a', Opt('b')))
+    def optional(self, *_):
+        return True
+
+    @rule(Plus('(', Star('x'), ')'))
+    def star(self, *_):
+        return True
+
+    @rule(Plus(Str('a', C['0':'9'])))
+    def string(self, *_):
+        return True
+
+    @rule(Plus(Capture('a', C['0':'9'])))
+    def capture(self, *_):
+        return True
+
+
+# rule name -> the unit of input it's run over
+COMBINATORS = {
+    'literal': 'abc',
+    'chr_range': 'q ',
+    'one_of': 'y,',
+    'ordered_choice': 'baz',
+    'sequence': 'abc',
+    'optional': 'ab',
+    'star': '(xxx)',
+    'string': 'a7',
+    'capture': 'a7',
+}
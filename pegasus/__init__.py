@@ -1,2 +1,4 @@
 from pegasus.parser import *
 import pegasus.rules as rules
+
+__version__ = '0.1.3'
@@ -0,0 +1,356 @@
+"""Static grammar checks
+
+Some grammars can't work no matter the input: left recursive rules recurse forever,
+and Plus/Star over a rule that can match nothing either stall or loop. Others carry
+dead weight, like Or() alternatives that can never be reached past an earlier one,
+or @rule methods that nothing uses. check_rule() and check_grammar() find both
+kinds, naming the @rule methods they were found in:
+
+    for issue in check_grammar(JsonParser, JsonParser.document):
+        print(issue)
+
+Rules are checked as they're compiled, too (unless compiled with `check=False`):
+errors raise a BadRuleException and warnings are issued as GrammarWarnings.
+
+Grammars can be checked from the command line (the exit status is 1 on errors):
+
+    python -m pegasus.check mymodule:MyParser [root rule ...]
+"""
+from __future__ import print_function, unicode_literals
+
+import importlib
+import sys
+import warnings
+from pegasus.rules import compile_rule, _first, _is_char, All, BadRuleException, Discard, Literal, Opt, Or, \
+    ParserRule, Plus, Seq, Str, In, _ChrRange, EOF, Dot, Cut
+
+
+class GrammarWarning(UserWarning):
+    pass
+
+
+class GrammarIssue(object):
+    """A problem found in a grammar
+
+    `kind` is one of 'left-recursion' or 'nullable-repetition' (errors), or
+    'shadowed' or 'unreachable' (warnings). `rule` is the name of the @rule method
+    the problem was found in and `node` the rule node itself.
+    """
+    ERRORS = ('left-recursion', 'nullable-repetition')
+
+    def __init__(self, kind, rule, node, message):
+        self.kind = kind
+        self.rule = rule
+        self.node = node
+        self.message = message
+
+    @property
+    def error(self):
+        return self.kind in GrammarIssue.ERRORS
+
+    def __repr__(self):
+        return 'GrammarIssue({!r}, {!r}, {!r})'.format(self.kind, self.rule, self.message)
+
+    def __str__(self):
+        return '{} ({}): {}'.format(self.rule, self.kind, self.message)
+
+
+def check_rule(rule):
+    """Checks the graph of a rule, returning a list of GrammarIssues"""
+    return _check(_walk(compile_rule(rule, check=False)))
+
+
+def check_grammar(parser_class, *roots):
+    """Checks all of a Parser subclass' rules, returning a list of GrammarIssues
+
+    If any `roots` are given, rules that can't be reached from any of them are
+    reported as unreachable.
+    """
+    rules = [compile_rule(getattr(parser_class, name), check=False) for name in sorted(dir(parser_class))
+             if hasattr(getattr(parser_class, name), '_rule')]
+
+    owners = {}
+    for root in rules:
+        for node, owner in _walk(root).items():
+            owners.setdefault(node, owner)
+    issues = _check(owners)
+
+    if len(roots):
+        reachable = set()
+        for root in roots:
+            reachable.update(_walk(compile_rule(root, check=False)))
+        for node in rules:
+            if node not in reachable:
+                issues.append(GrammarIssue('unreachable', repr(node), node, 'not reachable from {}'.format(
+                    ', '.join(repr(compile_rule(root, check=False)) for root in roots))))
+
+    return issues
+
+
+def _compiled(root, compiled):
+    """Checks a newly compiled graph, raising/warning about the issues in its new nodes"""
+    compiled = set(compiled)
+    issues = [issue for issue in _check(_walk(root)) if issue.node in compiled]
+
+    errors = [issue for issue in issues if issue.error]
+    if len(errors):
+        raise BadRuleException('invalid grammar:\n' + '\n'.join('- {}'.format(issue) for issue in errors))
+
+    for issue in issues:
+        warnings.warn(str(issue), GrammarWarning)
+
+
+def _walk(root):
+    """Maps every node of a graph to the name of the @rule it's part of"""
+    owners = {}
+    pending = [(root, None)]
+    while len(pending):
+        node, owner = pending.pop()
+        if node in owners:
+            continue
+
+        if isinstance(node, ParserRule):
+            owner = repr(node)
+        owners[node] = owner if owner is not None else repr(node)
+        pending += [(child, owner) for child in node.nodes]
+
+    return owners
+
+
+def _check(owners):
+    nullable = _nullable(owners)
+    succeeds = _succeeding(owners)
+    issues = []
+
+    for node, owner in owners.items():
+        if isinstance(node, Plus) and nullable[node.nodes[0]]:
+            issues.append(GrammarIssue('nullable-repetition', owner, node,
+                                       'repeats {!r}, which can match without consuming anything'.format(
+                                           node.nodes[0])))
+
+        if isinstance(node, Or):
+            issues += _shadowed(node, owner, nullable, succeeds)
+
+    issues += _left_recursion(owners, nullable)
+    return issues
+
+
+def _nullable(owners):
+    """Works out which nodes can match without consuming anything
+
+    Plain generator rules are taken not to be, since there's no telling.
+    """
+    nullable = dict((node, False) for node in owners)
+
+    changed = True
+    while changed:
+        changed = False
+        for node in owners:
+            if nullable[node]:
+                continue
+
+            if isinstance(node, Literal):
+                value = not len(node.utf)
+            elif node is EOF or isinstance(node, (Opt, Cut)):
+                value = True
+            elif isinstance(node, Seq):
+                value = all(nullable[child] for child in node.nodes)
+            elif isinstance(node, Or):
+                value = any(nullable[child] for child in node.nodes)
+            elif isinstance(node, (Plus, Discard, Str, ParserRule, All)):
+                value = nullable[node.nodes[0]]
+            else:
+                value = False
+
+            if value:
+                nullable[node] = changed = True
+
+    return nullable
+
+
+def _succeeding(owners):
+    """Works out which nodes match no matter the input (like Opt(), unlike EOF)"""
+    succeeds = dict((node, False) for node in owners)
+
+    changed = True
+    while changed:
+        changed = False
+        for node in owners:
+            if succeeds[node]:
+                continue
+
+            if isinstance(node, Literal):
+                value = not len(node.utf)
+            elif isinstance(node, (Opt, Cut)):
+                value = True
+            elif isinstance(node, Seq):
+                value = all(succeeds[child] for child in node.nodes)
+            elif isinstance(node, Or):
+                value = any(succeeds[child] for child in node.nodes)
+            elif isinstance(node, (Plus, Discard, Str, ParserRule)):
+                value = succeeds[node.nodes[0]]
+            else:
+                value = False
+
+            if value:
+                succeeds[node] = changed = True
+
+    return succeeds
+
+
+def _left(node, nullable):
+    """The children a node can run at the very position it was started at"""
+    if isinstance(node, Seq):
+        children = []
+        for child in node.nodes:
+            children.append(child)
+            if not nullable[child]:
+                break
+        return children
+
+    if isinstance(node, (Or, All)):
+        return node.nodes
+    if isinstance(node, (Opt, Plus, Discard, Str, ParserRule)):
+        return node.nodes[:1]
+    return ()
+
+
+def _left_recursion(owners, nullable):
+    issues = []
+    reported = set()
+    done = set()
+
+    for start in owners:
+        if start in done:
+            continue
+
+        # iterative depth-first search, keeping the current path on a stack
+        path = [start]
+        on_path = set(path)
+        iters = [iter(_left(start, nullable))]
+        while len(iters):
+            child = next(iters[-1], None)
+            if child is None:
+                node = path.pop()
+                on_path.discard(node)
+                done.add(node)
+                iters.pop()
+                continue
+
+            if child in on_path:
+                cycle = path[path.index(child):]
+                rules = [node for node in cycle if isinstance(node, ParserRule)]
+                key = frozenset(cycle)
+                if key not in reported:
+                    reported.add(key)
+                    names = [repr(node) for node in rules] or [repr(child)]
+                    issues.append(GrammarIssue('left-recursion', owners[child], child,
+                                               'left recursive: {}'.format(' -> '.join(names + names[:1]))))
+                continue
+
+            if child in done:
+                continue
+
+            path.append(child)
+            on_path.add(child)
+            iters.append(iter(_left(child, nullable)))
+
+    return issues
+
+
+def _fixed(node):
+    """The one string a node always matches, or None"""
+    if isinstance(node, Literal):
+        return node.utf
+    if isinstance(node, Seq):
+        parts = [_fixed(child) for child in node.nodes]
+        return None if None in parts else ''.join(parts)
+    if isinstance(node, (ParserRule, Discard, Str)):
+        return _fixed(node.nodes[0])
+    return None
+
+
+def _prefix(node):
+    """A string every match of the node starts with"""
+    if isinstance(node, Literal):
+        return node.utf
+    if isinstance(node, Seq):
+        prefix = ''
+        for child in node.nodes:
+            fixed = _fixed(child)
+            if fixed is None:
+                return prefix + _prefix(child)
+            prefix += fixed
+        return prefix
+    if isinstance(node, (ParserRule, Discard, Str, Plus)):
+        return _prefix(node.nodes[0])
+    return ''
+
+
+def _covers(node, chars):
+    """Whether or not a single character node matches every one of `chars`"""
+    if node is Dot:
+        return True
+    if isinstance(node, In):
+        return not node.inverse and all(c in node.chars for c in chars)
+    if isinstance(node, _ChrRange):
+        return not node.inverse and all(node.begin <= c <= node.end for c in chars)
+    if isinstance(node, Or):
+        return all(any(_covers(child, c) for child in node.nodes) for c in chars)
+    if isinstance(node, ParserRule):
+        return _covers(node.nodes[0], chars)
+    return False
+
+
+def _shadowed(node, owner, nullable, succeeds):
+    issues = []
+    alternatives = node.nodes
+
+    for j, later in enumerate(alternatives):
+        for earlier in alternatives[:j]:
+            reason = None
+            if succeeds[earlier]:
+                reason = '{!r} always matches'.format(earlier)
+            elif earlier is later:
+                reason = 'it is listed twice'
+            else:
+                fixed = _fixed(earlier)
+                if fixed and _prefix(later).startswith(fixed):
+                    reason = '{!r} matches a prefix of it'.format(earlier)
+                elif _is_char(earlier) and not nullable[later]:
+                    chars = _first(later)[0]
+                    if chars and _covers(earlier, chars):
+                        reason = '{!r} matches its first character'.format(earlier)
+
+            if reason is not None:
+                issues.append(GrammarIssue('shadowed', owner, node,
+                                           'alternative {!r} is never tried: {}'.format(later, reason)))
+                break
+
+    return issues
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not len(argv):
+        print('usage: python -m pegasus.check module:ParserClass [root rule ...]', file=sys.stderr)
+        return 2
+
+    module, _, name = argv[0].partition(':')
+    parser_class = getattr(importlib.import_module(module), name)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', GrammarWarning)
+        try:
+            issues = check_grammar(parser_class, *[getattr(parser_class, root) for root in argv[1:]])
+        except BadRuleException as e:
+            print(e)
+            return 1
+
+    for issue in sorted(issues, key=lambda issue: (not issue.error, issue.rule)):
+        print('{}: {}'.format('error' if issue.error else 'warning', issue))
+    return 1 if any(issue.error for issue in issues) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,605 @@
+"""Generates plain Python recursive-descent parsers from @rule grammars
+
+generate() takes a Parser subclass and emits the source of a module with one
+function per @rule method. Generated functions work directly on an integer
+position into the input string, returning a `(position, result)` tuple on success
+or None on failure, and call the visitor methods directly as rules complete.
+Everything below a @rule method is inlined as straight-line code.
+
+Generated parsers use PEG semantics: Or() is an ordered choice, and failed
+alternatives (as well as failed Opt/Plus/Star iterations) simply rewind the position.
+A Cut() sets a flag in the shared state that the enclosing Or() checks before
+trying its next alternative.
+
+    from pegasus.codegen import compile_grammar
+
+    grammar = compile_grammar(JsonParser)
+    grammar.parse(JsonParser(), 'document', '{"hello": "world"}')
+
+Generated sources can be cached on disk, so that later processes load them instead
+of compiling the grammar all over again (see compile_grammar()).
+"""
+import hashlib
+import imp
+import os
+import sys
+
+import pegasus
+from pegasus.rules import compile_rule, _first, _is_pure, BadRuleException, ParseError, ParserRule, Literal, Or, Seq, \
+    Opt, Plus, Discard, Str, In, _ChrRange, EOF, Dot, Cut, Lazy, Rule, _COMPILING
+
+
+def _fail(st, pos, expected):
+    """Records a failure, keeping only the furthest ones"""
+    if pos > st[0]:
+        st[0] = pos
+        st[1] = [expected]
+    else:
+        st[1].append(expected)
+
+
+def _skipped(st, pos, c, guards):
+    """Records the alternatives of an Or() that were skipped as failures"""
+    for chars, expected in guards:
+        if c not in chars:
+            _fail(st, pos, expected)
+
+
+def _run(fn, parser, text, match):
+    st = [0, [], False, []]
+    result = fn(parser, text, 0, st)
+
+    if result is not None:
+        if not match or result[0] == len(text):
+            return result[1][0] if len(result[1]) else None
+        if result[0] >= st[0]:
+            _fail(st, result[0], '<EOF>')
+
+    # the scanned matches put off recording what ended them until the parse failed (see rules._ended())
+    for retry, start in st[3]:
+        retry(parser, text, start, st)
+
+    pos, expected = st[:2]
+    unique = []
+    for exp in expected:
+        if exp not in unique:
+            unique.append(exp)
+
+    raise ParseError(got=text[pos] if pos < len(text) else '<EOF>', expected=unique, position=pos)
+
+
+class _Function(object):
+    """The body of a single generated function"""
+    def __init__(self, name):
+        self.name = name
+        self.lines = []
+        self.depth = 1
+        self.counter = 0
+
+    def line(self, text):
+        self.lines.append('    ' * self.depth + text)
+
+    def var(self, prefix):
+        self.counter += 1
+        return '{}{}'.format(prefix, self.counter)
+
+
+class _Generator(object):
+    def __init__(self, parser_class):
+        self.parser_class = parser_class
+        self.imports = {}
+        self.visitors = {}
+        self.constants = {}
+        self.patterns = {}
+        self.functions = {}
+        self.retries = {}
+        self.names = set()
+        self.sources = []
+        self.pending = []
+
+    def constant(self, value):
+        """Hoists a constant value to module level"""
+        key = (type(value), value)
+        if key not in self.constants:
+            self.constants[key] = ('_k{}'.format(len(self.constants) + 1), value)
+        return self.constants[key][0]
+
+    def pattern(self, pattern):
+        """Hoists a compiled regex's match() method to module level"""
+        if pattern not in self.patterns:
+            self.patterns[pattern] = '_p{}'.format(len(self.patterns) + 1)
+        return self.patterns[pattern]
+
+    def visitor(self, fn):
+        """Returns the module-level name bound to a visitor function"""
+        if fn not in self.visitors:
+            owner = self.locate(fn)
+            if owner not in self.imports:
+                self.imports[owner] = '_g{}'.format(len(self.imports) + 1)
+            self.visitors[fn] = ('_v_{}'.format(self.functions[fn]), self.imports[owner], fn.__name__)
+        return self.visitors[fn][0]
+
+    def locate(self, fn):
+        """Finds the class defining a visitor, for the generated module to get it from"""
+        candidates = list(self.parser_class.__mro__)
+        module = sys.modules.get(fn.__module__)
+        if module is not None:
+            candidates += [obj for obj in vars(module).values() if isinstance(obj, type)]
+
+        for cls in candidates:
+            if cls.__dict__.get(fn.__name__) is fn:
+                return cls
+
+        raise BadRuleException('cannot locate the class defining rule: {}'.format(fn.__name__))
+
+    def function(self, node):
+        """Returns the name of the function generated for a ParserRule node"""
+        fn = node.class_rule
+        if fn not in self.functions:
+            name = fn.__name__
+            counter = 1
+            while name in self.names:
+                counter += 1
+                name = '{}_{}'.format(fn.__name__, counter)
+
+            self.names.add(name)
+            self.functions[fn] = name
+            self.pending.append(node)
+
+        return '_r_{}'.format(self.functions[fn])
+
+    def retry(self, node):
+        """Returns the name of the function matching `node` at `pos` for the failures it records alone"""
+        if node not in self.retries:
+            f = _Function('_e{}'.format(len(self.retries) + 1))
+            self.retries[node] = f.name
+            f.line('n = len(text)')
+            self.emit_attempt(f, node, f.var('r'))
+            self.sources += ['', '', 'def {}(parser, text, pos, st):'.format(f.name)] + f.lines
+
+        return self.retries[node]
+
+    def generate(self):
+        roots = {}
+        for name in dir(self.parser_class):
+            attr = getattr(self.parser_class, name)
+            if hasattr(attr, '_rule'):
+                roots[name] = self.function(compile_rule(attr))
+
+        while len(self.pending):
+            self.emit_function(self.pending.pop(0))
+
+        lines = [
+            '# Generated by pegasus from {}.{}; do not edit.'.format(self.parser_class.__module__, self.parser_class.__name__),
+            'import re as _re',
+            'from pegasus.codegen import _fail, _run, _skipped',
+            'from pegasus.rules import Span as _Span, _join',
+        ]
+
+        # compile_grammar() passes the classes in when it runs freshly generated code, which works for classes
+        # that can't be imported (like ones defined in a function); only cached sources import them
+        for cls, alias in sorted(self.imports.items(), key=lambda item: item[1]):
+            lines.append('if {!r} not in globals():'.format(alias))
+            lines.append('    from {} import {} as {}'.format(cls.__module__, cls.__name__, alias))
+
+        lines.append('')
+        for name, alias, attr in sorted(self.visitors.values()):
+            lines.append('{} = {}.__dict__[{!r}]'.format(name, alias, attr))
+
+        for key, (name, value) in sorted(self.constants.items(), key=lambda item: item[1][0]):
+            lines.append('{} = {!r}'.format(name, value))
+
+        for pattern, name in sorted(self.patterns.items(), key=lambda item: item[1]):
+            lines.append('{} = _re.compile({!r}, _re.DOTALL).match'.format(name, pattern))
+
+        lines += self.sources
+
+        lines += ['', '', 'RULES = {']
+        for name, function in sorted(roots.items()):
+            lines.append('    {!r}: {},'.format(name, function))
+        lines += [
+            '}',
+            '',
+            '',
+            'def parse(parser, rule, text, match=True):',
+            '    return _run(RULES[rule], parser, text, match)',
+            '',
+        ]
+
+        return '\n'.join(lines)
+
+    def emit_function(self, node):
+        f = _Function(self.function(node))
+        f.line('n = len(text)')
+        result = self.emit(f, node.nodes[0], 'return None')
+        f.line('v = {}(parser, *{})'.format(self.visitor(node.class_rule), result))
+        f.line('return pos, ((v,) if v is not None else ())')
+
+        self.sources += ['', '', 'def {}(parser, text, pos, st):'.format(f.name)] + f.lines
+
+    def expect(self, f, expected, fail):
+        f.line('    if pos >= st[0]:')
+        f.line('        _fail(st, pos, {})'.format(self.constant(expected)))
+        f.line('    ' + fail)
+
+    def emit(self, f, node, fail, scan=True):
+        """Emits the code matching `node` at `pos`, running `fail` if it doesn't match
+
+        Returns an expression (a variable or constant) holding the node's result tuple.
+        """
+        if scan and node.scanner is not None:
+            return self.emit_scan(f, node, fail)
+
+        if isinstance(node, ParserRule):
+            t = f.var('t')
+            r = f.var('r')
+            f.line('{} = {}(parser, text, pos, st)'.format(t, self.function(node)))
+            f.line('if {} is None:'.format(t))
+            f.line('    ' + fail)
+            f.line('pos, {} = {}'.format(r, t))
+            return r
+
+        if isinstance(node, Literal):
+            f.line('if text[pos:pos + {}] != {}:'.format(len(node.utf), self.constant(node.utf)))
+            self.expect(f, repr(node.utf), fail)
+            f.line('pos += {}'.format(len(node.utf)))
+            return self.constant((node.utf,))
+
+        if isinstance(node, (In, _ChrRange)) or node is Dot:
+            if node is Dot:
+                f.line('if pos >= n:')
+                expected = 'any non-EOF character'
+            elif isinstance(node, In):
+                chars = node.chars
+                if not isinstance(chars, basestring):
+                    chars = frozenset(chars)
+                f.line('if pos >= n or text[pos] {}in {}:'.format('' if node.inverse else 'not ', self.constant(chars)))
+                expected = '{}one of: {}'.format('not ' if node.inverse else '', repr(''.join(node.chars)))
+            else:
+                f.line('if pos >= n or {}{} <= text[pos] <= {}:'.format(
+                    '' if node.inverse else 'not ', self.constant(node.begin), self.constant(node.end)))
+                expected = 'character in class [{}-{}]'.format(repr(node.begin), repr(node.end))
+
+            self.expect(f, expected, fail)
+            c = f.var('c')
+            f.line('{} = text[pos]'.format(c))
+            f.line('pos += 1')
+            return '({},)'.format(c)
+
+        if node is EOF:
+            f.line('if pos < n:')
+            self.expect(f, '<EOF>', fail)
+            return '()'
+
+        if isinstance(node, Cut):
+            f.line('st[2] = True')
+            return '()'
+
+        if isinstance(node, Seq):
+            results = [self.emit(f, child, fail) for child in node.nodes]
+            results = [result for result in results if result != '()']
+            if len(results) < 2:
+                return results[0] if len(results) else '()'
+            r = f.var('r')
+            f.line('{} = {}'.format(r, ' + '.join(results)))
+            return r
+
+        if isinstance(node, Or) and node.charclass is not None and not node.charclass.ranges:
+            f.line('if pos >= n or text[pos] not in {}:'.format(self.constant(node.charclass.chars)))
+            f.line('    if pos >= st[0]:')
+            for expected in node.failures:
+                f.line('        _fail(st, pos, {})'.format(self.constant(expected)))
+            f.line('    ' + fail)
+            c = f.var('c')
+            f.line('{} = text[pos]'.format(c))
+            f.line('pos += 1')
+            return '({},)'.format(c)
+
+        if isinstance(node, Or):
+            s = f.var('s')
+            r = f.var('r')
+            c = f.var('c')
+            f.line('{} = pos'.format(s))
+            f.line('{} = None'.format(r))
+            if node.cuts:
+                k = f.var('k')
+                f.line('{} = st[2]'.format(k))
+
+            # alternatives that can't start with the current character are skipped
+            guards = []
+            if node.table is not None:
+                f.line('{} = text[pos:pos + 1]'.format(c))
+            for i, child in enumerate(node.nodes):
+                chars, nullable = _first(child)
+                guard = None
+                if node.table is not None and chars is not None and not nullable:
+                    guard = self.constant(chars)
+                    guards.append((chars, repr(child)))
+
+                conditions = (['{} is None'.format(r)] if i > 0 else []) + (['{} in {}'.format(c, guard)] if guard else [])
+                if node.cuts and i > 0:
+                    conditions.append('not st[2]')
+                if len(conditions):
+                    f.line('if {}:'.format(' and '.join(conditions)))
+                    f.depth += 1
+                if i > 0:
+                    f.line('pos = {}'.format(s))
+                if node.cuts:
+                    f.line('st[2] = False')
+                self.emit_attempt(f, child, r)
+                if len(conditions):
+                    f.depth -= 1
+
+            if node.cuts:
+                f.line('st[2] = {}'.format(k))
+            f.line('if {} is None:'.format(r))
+            if len(guards):
+                f.line('    if {} >= st[0]:'.format(s))
+                f.line('        _skipped(st, {}, {}, {})'.format(s, c, self.constant(tuple(guards))))
+            f.line('    ' + fail)
+            return r
+
+        if isinstance(node, Opt):
+            s = f.var('s')
+            r = f.var('r')
+            f.line('{} = pos'.format(s))
+            f.line('{} = None'.format(r))
+            self.emit_attempt(f, node.nodes[0], r)
+            f.line('if {} is None:'.format(r))
+            f.line('    pos = {}'.format(s))
+            f.line('    {} = ()'.format(r))
+            return r
+
+        if isinstance(node, Plus):
+            a = f.var('a')
+            s = f.var('s')
+            f.line('{} = []'.format(a))
+            f.line('while 1:')
+            f.depth += 1
+            f.line('{} = pos'.format(s))
+            result = self.emit(f, node.nodes[0], 'break')
+            f.line('{}.append({})'.format(a, result))
+            f.line('if pos == {}:'.format(s))
+            f.line('    break')
+            f.depth -= 1
+            f.line('pos = {}'.format(s))
+            f.line('if not {}:'.format(a))
+            f.line('    ' + fail)
+            r = f.var('r')
+            f.line('{} = tuple({})'.format(r, a))
+            return r
+
+        if isinstance(node, Discard):
+            self.emit(f, node.nodes[0], fail)
+            return '()'
+
+        if isinstance(node, Str):
+            r = f.var('r')
+            if node.span:
+                s = f.var('s')
+                f.line('{} = pos'.format(s))
+                self.emit(f, node.nodes[0], fail)
+                f.line('{} = (_Span(text, {}, pos),)'.format(r, s))
+            elif _is_pure(node.nodes[0]):
+                s = f.var('s')
+                f.line('{} = pos'.format(s))
+                self.emit(f, node.nodes[0], fail)
+                f.line('{} = (text[{}:pos],)'.format(r, s))
+            else:
+                result = self.emit(f, node.nodes[0], fail)
+                f.line('{} = (_join({}),)'.format(r, result))
+            return r
+
+        raise BadRuleException('cannot generate code for rule: {}'.format(repr(node)))
+
+    def emit_scan(self, f, node, fail):
+        """Emits a single regex match for a node made up of terminals
+
+        If the regex doesn't match, the regular code runs to find out why.
+        """
+        m = f.var('m')
+        r = f.var('r')
+        f.line('{} = {}(text, pos)'.format(m, self.pattern(node.scanner.__self__.pattern)))
+
+        if isinstance(node, Opt):
+            f.line('pos = {}.end()'.format(m))
+            self.emit_ended(f, node, '{}.start()'.format(m))
+            if isinstance(node.nodes[0], Plus):
+                f.line('{} = tuple(zip({}.group()))'.format(r, m))
+            else:
+                f.line('{0} = ({1}.group(),) if pos > {1}.start() else ()'.format(r, m))
+            return r
+
+        f.line('if {} is not None:'.format(m))
+        f.line('    pos = {}.end()'.format(m))
+        f.depth += 1
+        self.emit_ended(f, node if isinstance(node, Plus) else node.nodes[0], '{}.start()'.format(m))
+        f.depth -= 1
+        if isinstance(node, Str) and node.span:
+            f.line('    {} = (_Span(text, {}.start(), pos),)'.format(r, m))
+        elif isinstance(node, Str):
+            f.line('    {} = ({}.group(),)'.format(r, m))
+        elif isinstance(node, Plus):
+            f.line('    {} = tuple(zip({}.group()))'.format(r, m))
+        else:
+            f.line('    {} = ()'.format(r))
+        f.line('else:')
+        f.depth += 1
+        result = self.emit(f, node, fail, scan=False)
+        f.line('{} = {}'.format(r, result))
+        f.depth -= 1
+        return r
+
+    def emit_ended(self, f, node, start):
+        """Emits the code recording the failures that ended a scanned match of `node`
+        from `start` up to `pos`, the way _ended() does"""
+        if isinstance(node, Plus):
+            self.emit_retry(f, node.nodes[0], 'pos')
+        elif isinstance(node, Opt):
+            f.line('if pos == {}:'.format(start))
+            f.depth += 1
+            self.emit_retry(f, node.nodes[0], 'pos')
+            f.depth -= 1
+            f.line('else:')
+            f.depth += 1
+            count = len(f.lines)
+            self.emit_ended(f, node.nodes[0], start)
+            if len(f.lines) == count:
+                f.line('pass')
+            f.depth -= 1
+        elif isinstance(node, Str):
+            self.emit_ended(f, node.nodes[0], start)
+        elif isinstance(node, (Seq, Or)):
+            f.line('st[3].append(({}, {}))'.format(self.retry(node), start))
+
+    def emit_retry(self, f, node, start):
+        """Emits an attempt at matching `node` at `start` for the failures it records alone"""
+        e = f.var('e')
+        f.line('{} = pos'.format(e))
+        if start != 'pos':
+            f.line('pos = {}'.format(start))
+        self.emit_attempt(f, node, f.var('r'))
+        f.line('pos = {}'.format(e))
+
+    def emit_attempt(self, f, node, r):
+        """Emits a block that sets `r` to the node's result if it matches (leaving it None otherwise)"""
+        f.line('while 1:')
+        f.depth += 1
+        result = self.emit(f, node, 'break')
+        f.line('{} = {}'.format(r, result))
+        f.line('break')
+        f.depth -= 1
+
+
+def generate(parser_class):
+    """Generates the source of a parser module for all of a Parser subclass' rules"""
+    return _Generator(parser_class).generate()
+
+
+def compile_grammar(parser_class, cache=None):
+    """Generates and loads a parser module for a Parser subclass (only once per class)
+
+    With `cache`, the generated source is saved to a cache directory and loaded
+    from there by later processes for as long as the grammar (and pegasus) stays the
+    same: True puts it in a __pegasus__ directory next to the grammar's module, a
+    string names the directory to use. `cache` defaults to the PEGASUS_CACHE
+    environment variable, if set.
+    """
+    with _COMPILING:
+        module = parser_class.__dict__.get('_generated')
+        if module is None:
+            name = 'pegasus_generated_{}'.format(parser_class.__name__)
+            if cache is None:
+                cache = os.environ.get('PEGASUS_CACHE') or False
+
+            module = imp.new_module(name)
+            path = _cache_path(parser_class, cache) if cache else None
+            source = _load(path) if path is not None else None
+            if source is None:
+                generator = _Generator(parser_class)
+                source = generator.generate()
+                module.__dict__.update((alias, cls) for cls, alias in generator.imports.items())
+                if path is not None:
+                    _save(path, source)
+
+            exec(compile(source, path or '<{}>'.format(name), 'exec'), module.__dict__)
+            parser_class._generated = module
+
+        return module
+
+
+def fingerprint(parser_class):
+    """Hashes the rule definitions of a Parser subclass, along with the pegasus version
+
+    Only the rules themselves are looked at (not the visitor methods, which generated
+    parsers import), without building or compiling anything. That includes the rules
+    of other classes and modules they refer to, since those get generated as well.
+    """
+    digest = hashlib.sha1('{}\n{}.{}\n'.format(pegasus.__version__, parser_class.__module__,
+                                               parser_class.__name__).encode('utf-8'))
+    pending = []
+    for name in sorted(dir(parser_class)):
+        value = getattr(parser_class, name)
+        if getattr(value, '_rule', None) is not None:
+            pending.append((name, getattr(value, '__func__', value)))
+
+    seen = set()
+    while len(pending):
+        name, fn = pending.pop(0)
+        if fn not in seen:
+            seen.add(fn)
+            digest.update('{} = {}\n'.format(name, _describe(fn._rule, pending)).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def _describe(rule, found=None):
+    """A stable description of a (built or unbuilt, compiled or not) rule
+
+    @rule methods are described by name; `found` collects them (as `(name, function)`
+    tuples) for them to be described as well.
+    """
+    if isinstance(rule, list):
+        return '[{}]'.format(', '.join(_describe(child, found) for child in rule))
+    if isinstance(rule, tuple):
+        return '({})'.format(', '.join(_describe(child, found) for child in rule))
+    if isinstance(rule, Lazy):
+        try:
+            rule = rule.resolve()
+        except BadRuleException:
+            return rule.name
+    if isinstance(rule, ParserRule):
+        rule = rule.class_rule
+    if isinstance(rule, Rule):
+        if type(rule).__repr__ is not Rule.__repr__:
+            # leaves describe themselves
+            return repr(rule)
+        return '{}{}({})'.format(type(rule).__name__, ':span' if getattr(rule, 'span', False) else '',
+                                 ', '.join(_describe(child, found) for child in rule.nodes))
+    if callable(rule):
+        fn = getattr(rule, '__func__', rule)
+        if getattr(fn, '_rule', None) is None:
+            return fn.__name__
+        name = '{}:{}'.format(fn.__module__, fn.__name__)
+        if found is not None:
+            found.append((name, fn))
+        return name
+    return repr(rule)
+
+
+def _cache_path(parser_class, cache):
+    if cache is True:
+        module = sys.modules.get(parser_class.__module__)
+        if getattr(module, '__file__', None) is None:
+            return None
+        cache = os.path.join(os.path.dirname(os.path.abspath(module.__file__)), '__pegasus__')
+
+    return os.path.join(cache, '{}.{}-{}.py'.format(parser_class.__module__, parser_class.__name__,
+                                                    fingerprint(parser_class)[:16]))
+
+
+def _load(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8')
+    except (IOError, OSError):
+        return None
+
+
+def _save(path, source):
+    """Writes a generated source to the cache, if possible, making sure nobody sees it half-written"""
+    temp = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                # someone else might have just created it
+                pass
+        with open(temp, 'wb') as f:
+            f.write(source.encode('utf-8'))
+        os.rename(temp, path)
+    except (IOError, OSError):
+        # caching is best effort, just like .pyc files
+        if os.path.exists(temp):
+            os.remove(temp)
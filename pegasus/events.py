@@ -0,0 +1,44 @@
+"""Event mode output for huge repetitions
+
+A Plus() or Star() given an `events` name doesn't collect the results of its
+iterations when the parse has an EventHandler: each iteration's results are handed
+to the handler as soon as it completes, and the repetition itself returns nothing.
+A JSON array of millions of values can then be processed in constant memory:
+
+    class JsonParser(Parser):
+        @rule(_('['), Opt(value, Star(_(','), value, events='values')), _(']'))
+        def array(self, *values):
+            ...
+
+    class Values(EventHandler):
+        def item(self, name, value):
+            ...
+
+    parser.parse(JsonParser.array, stream, handler=Values())
+
+Parses without a handler (and generated parsers) collect the results as usual.
+
+Items are handed over as they're matched, so a repetition inside of an Or()
+alternative that ends up failing will already have reported some; put event mode
+repetitions where the grammar is committed to them (see Cut()). Streamed parses
+only run in constant memory without `packrat`.
+"""
+from __future__ import unicode_literals
+
+
+class EventHandler(object):
+    """Base class for event handlers; the hooks do nothing unless overridden
+
+    `name` is the `events` name of the repetition.
+    """
+    def start(self, name):
+        """Called before the first item of a repetition"""
+        pass
+
+    def item(self, name, *results):
+        """Called with the results of each iteration as it completes"""
+        pass
+
+    def end(self, name, count):
+        """Called after the last of a repetition's `count` items"""
+        pass
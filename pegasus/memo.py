@@ -0,0 +1,159 @@
+"""Packrat memoization"""
+from collections import OrderedDict
+
+
+class MemoTable(object):
+    """A (rule, position) -> entry memo table with an optional size cap
+
+    When `size` is given the table never holds more than `size` entries,
+    evicting the least recently used ones first. Entries behind a commit point
+    (see commit()) are dropped altogether since the parse will never get back
+    to them.
+    """
+    # whether or not rules may match with regex scanners, and how far into the
+    # input the entries' runs looked (see IncrementalMemo)
+    scan = True
+    reaches = None
+
+    def __init__(self, size=None):
+        if size is not None and size < 1:
+            raise ValueError('memo table size must be at least 1')
+
+        self.size = size
+        self.entries = {} if size is None else OrderedDict()
+        self.floor = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, rule, pos):
+        key = (rule, pos)
+        entry = self.entries.get(key)
+        if entry is not None and self.size is not None:
+            # move it to the back of the line
+            del self.entries[key]
+            self.entries[key] = entry
+        return entry
+
+    def put(self, rule, pos, entry):
+        self.entries[(rule, pos)] = entry
+        if self.size is not None and len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def commit(self, pos):
+        """Drops all entries for positions before `pos`"""
+        if pos <= self.floor:
+            return
+
+        self.floor = pos
+        for key in [key for key in self.entries if key[1] < pos]:
+            del self.entries[key]
+
+
+class MemoEntry(object):
+    """The memoized run of a rule generator
+
+    The generator is shared by everyone that started the rule at the same position;
+    whatever it has yielded so far is kept in `log` so that consumers can replay it
+    in lockstep, and whoever is furthest along advances it.
+
+    Steps that passed a Cut() are kept in `cuts`, so that replaying them commits
+    the replaying parse's Or() just the same (see ParseContext.cut).
+    """
+    def __init__(self, gen):
+        self.gen = gen
+        self.log = []
+        self.error = None
+        self.cuts = None
+
+    def replay(self, context=None):
+        log = self.log
+        i = 0
+        while True:
+            if i < len(log):
+                item = log[i]
+                if self.cuts is not None and i in self.cuts and context is not None:
+                    context.cut = True
+            elif self.error is not None:
+                raise self.error
+            else:
+                outer = False
+                if context is not None:
+                    outer, context.cut = context.cut, False
+                try:
+                    item = next(self.gen)
+                except Exception as e:
+                    self.error = e
+                    self.gen = None
+                    raise
+                finally:
+                    if context is not None:
+                        if context.cut:
+                            self.cuts = (self.cuts or set()) | set([i])
+                        context.cut = context.cut or outer
+
+                log.append(item)
+
+            i += 1
+            yield item
+
+            if item[0] is not None:
+                break
+
+
+class IncrementalMemo(MemoTable):
+    """A memo table that can be carried over to an edited version of the input
+
+    `reaches` maps the entries' keys to the (exclusive) end of the input their runs
+    looked at. A run is taken to have looked `lookahead` characters past the
+    furthest failure seen by the time it's done (the length of the grammar's longest
+    literal), and one past the end of the input if it got there. Rules don't match
+    with regex scanners on it, since there's no telling how far those look ahead.
+    """
+    scan = False
+
+    def __init__(self, lookahead=1):
+        super(IncrementalMemo, self).__init__()
+        self.reaches = {}
+        self.lookahead = lookahead
+
+    def commit(self, pos):
+        super(IncrementalMemo, self).commit(pos)
+        for key in [key for key in self.reaches if key not in self.entries]:
+            del self.reaches[key]
+
+    def edit(self, start, end, delta):
+        """Returns a table with the entries still valid once [start, end) of the input has
+        been replaced, changing its length by `delta`
+
+        Entries that looked at nothing past `start` are kept as they are, and entries
+        from `end` on are moved along by `delta` (rules never look behind where they
+        started).
+        """
+        memo = IncrementalMemo(self.lookahead)
+        entries, reaches = memo.entries, memo.reaches
+        for key, reach in self.reaches.iteritems():
+            if reach <= start:
+                entries[key] = self.entries[key]
+                reaches[key] = reach
+            elif key[1] >= end:
+                entry = self.entries[key]
+                if delta:
+                    key = key[0], key[1] + delta
+                    reach += delta
+                    if entry is not False:
+                        entry = _shifted(entry, delta)
+                entries[key] = entry
+                reaches[key] = reach
+
+        return memo
+
+
+def _shifted(entry, delta):
+    """Moves a memoized match along by `delta`"""
+    if isinstance(entry[0], tuple):
+        # a (match, cut) pair, see ParserRule.match()
+        return _shifted(entry[0], delta), entry[1]
+    if entry[0] is False:
+        return entry
+    return entry[0] + delta, entry[1]
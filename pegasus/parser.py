@@ -6,8 +6,13 @@ Check out http://stackoverflow.com/a/844443/510036
 from __future__ import unicode_literals
 
 import inspect
-from itertools import chain as iterchain
-from pegasus.rules import _build_rule, ParseError, Lazy
+import itertools
+import mmap
+import multiprocessing
+import pegasus.rules
+from pegasus.memo import IncrementalMemo, MemoTable
+from pegasus.rules import compile_rule, Literal, ParseContext, ParseError, _bind_lazy, _FAILURE
+from pegasus.trace import PrintTracer
 
 
 class EmptyRuleException(Exception):
@@ -23,64 +28,541 @@ class NotARuleException(Exception):
 
 
 def rule(*rules):
-    stack = inspect.stack()[1]
-    caller_module = stack[3]
-    caller_file = stack[1]
-
     """Marks a method as a rule"""
     def wrapper(fn):
-        _rules = rules
-        if len(_rules) == 0:
+        if len(rules) == 0:
             raise EmptyRuleException('cannot supply an empty rule')
 
-        Lazy._LOOKUPS[(caller_file, caller_module, fn.__name__)] = fn
-
         setattr(fn, '_rule', rules)
         return fn
 
     return wrapper
 
 
+class _ParserType(type):
+    """Binds the Lazy references in a Parser subclass' rules to the class as it's defined"""
+    def __init__(cls, name, bases, attrs):
+        super(_ParserType, cls).__init__(name, bases, attrs)
+        for value in attrs.values():
+            rules = getattr(value, '_rule', None)
+            if rules is not None:
+                _bind_lazy(rules, cls)
+
+
 class Parser(object):
     """The Pegasus Parser base class
 
     Extend this class and write visitor methods annotated with the @rule decorator,
     create an instance of the parser and call .parse('some str') on it.
+
+    Set `tracer` to a pegasus.trace.Tracer to have it follow every parse the
+    instance runs (unless a parse is given a tracer of its own).
+
+    Parsers are safe to share between threads: all of a parse's state lives in its
+    own ParseContext (and memo table), and compiled rule graphs (as well as generated
+    parsers) are never modified once built. Visitor methods that keep state on the
+    instance have to look after it themselves.
     """
+    __metaclass__ = _ParserType
 
-    def parse(self, rule, iterable, match=True):
-        """Parses and visits an iterable"""
-        if not hasattr(rule, '_rule') or not inspect.ismethod(rule):
-            raise NotARuleException('the specified `rule\' value is not actually a rule: %r' % (rule,))
+    tracer = None
 
-        prule = _build_rule(rule)
+    def parse(self, rule, iterable, match=True, packrat=False, memo_size=None, tracer=None, handler=None,
+              engine='stream'):
+        """Parses and visits an iterable
 
-        itr = iterchain.from_iterable(iterable)
-        c = None
-        grule = None
+        The input is streamed through the rules one character at a time. Byte buffers
+        (bytearray, memoryview, buffer) are parsed as bytes, without decoding them:
+        the grammar's characters match the bytes of the same value, and results hold
+        byte strings.
 
-        for c in itr:
-            reconsume = True
-            while reconsume:
-                if grule is None:
-                    grule = prule(lambda: c, self)
+        With `engine='indexed'`, a string or byte buffer is parsed by backtracking
+        over positions into it instead, which is a lot faster but doesn't agree with
+        streaming on every grammar. The indexed engine (like generated parsers, see
+        pegasus.codegen) has PEG semantics: Or() is an ordered choice, and a failed
+        Opt()/Plus() iteration gives back whatever it matched. Streamed input is never
+        rewound: Or() alternatives run side by side and the first one to complete wins,
+        wherever it is in the list, and input consumed by a failed Opt()/Plus()
+        iteration stays consumed (so streaming can accept input the indexed engine
+        rejects, like a trailing comma in a JSON array).
+
+        With `packrat`, each rule's run at a given input position is memoized so that
+        rules reached from several branches only ever run once per position.
+        `memo_size` caps the number of entries kept in the memo table (least recently
+        used ones are evicted first).
+
+        `tracer` is a pegasus.trace.Tracer to tell about every rule the parse runs.
+
+        `handler` is a pegasus.events.EventHandler to hand the items of event mode
+        repetitions to as they're parsed.
+        """
+        text, binary = _indexed(iterable, engine)
+        prule, tracer = _setup(self, rule, tracer)
+        memo = MemoTable(memo_size) if packrat else None
+
+        if text is not None:
+            return _parse_text(self, prule, text, match, memo, binary, tracer, handler)
+        return _parse_stream(self, prule, _chunks(iterable), match, memo, tracer, handler)
+
+    def parse_file(self, rule, path, match=True, packrat=False, memo_size=None, tracer=None, handler=None,
+                   engine='stream'):
+        """Parses and visits the contents of a file, as bytes (see parse())
+
+        The file is memory-mapped and parsed straight from the mapping, so it never
+        has to be read into memory as a whole. With the indexed engine, results and
+        error positions are sliced out of / point into the mapping, which stays open
+        for as long as anything (like a Span in the result) refers to it. The options
+        are the same as for parse().
+        """
+        _indexed('', engine)
+        prule, tracer = _setup(self, rule, tracer)
+        memo = MemoTable(memo_size) if packrat else None
+
+        with open(path, 'rb') as f:
+            try:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                return None
+
+        if engine == 'stream':
+            return _parse_stream(self, prule, [buffer(mapping)], match, memo, tracer, handler)
+
+        # not closed explicitly: Spans in the result may still refer to it
+        return _parse_text(self, prule, mapping, match, memo, True, tracer, handler)
+
+    def start(self, rule, match=True, packrat=False, memo_size=None, tracer=None, handler=None):
+        """Starts an incremental parse of `rule`
+
+        Returns a ParseSession; push the input into it with feed() as it arrives and
+        call close() at the end of it. The options are the same as for parse().
+        """
+        prule, tracer = _setup(self, rule, tracer)
+        memo = MemoTable(memo_size) if packrat else None
+        return ParseSession(self, prule, match, memo, tracer, handler)
+
+    def iterparse(self, rule, iterable, packrat=False, memo_size=None, tracer=None, engine='stream'):
+        """Parses successive matches of `rule` off of one input, yielding their results
+
+        The rule is restarted on whatever input follows each match, so it has to
+        consume any separators between the matches itself. Streamed input isn't kept
+        around once it's been consumed, so memory use doesn't grow with the length of
+        the stream. The options are the same as for parse().
+        """
+        text, binary = _indexed(iterable, engine)
+        prule, tracer = _setup(self, rule, tracer)
+
+        if text is not None:
+            return _iterparse_text(self, prule, text, packrat, memo_size, binary, tracer)
+        return _iterparse_stream(self, prule, _chunks(iterable), packrat, memo_size, tracer)
+
+    def parse_incremental(self, rule, text, match=True):
+        """Parses a string, keeping what's needed to reparse it after edits (see reparse())
+
+        The string is always parsed with the indexed engine (see parse()). Returns an
+        IncrementalParse. Unlike parse(), a failed parse doesn't raise: its
+        ParseError is kept in the IncrementalParse's `error`, so that the text can be
+        reparsed once it's been fixed.
+        """
+        prule = _compile(rule)
+        memo = IncrementalMemo(_lookahead(prule))
+        return _parse_incremental(self, prule, text, match, memo)
+
+    def reparse(self, previous, text, start, end):
+        """Reparses an edited version of an IncrementalParse's text
+
+        `start` and `end` delimit the part of `previous.text` that was replaced to
+        make `text`. Memoized rule results that didn't look at the replaced part are
+        reused, moved along by the change in length if they're past it, so only the
+        region around the edit is actually parsed again. Results are reused as they
+        are: any Spans in them still point into the text they were parsed from.
+
+        Returns a new IncrementalParse; `previous` can still be reparsed as well.
+        """
+        if not 0 <= start <= end <= len(previous.text):
+            raise ValueError('edit range out of bounds: {}-{}'.format(start, end))
+
+        memo = previous.memo.edit(start, end, len(text) - len(previous.text))
+        return _parse_incremental(self, previous.rule, text, previous.match, memo)
+
+    def parse_many(self, rule, inputs, workers=None, ordered=True, chunksize=1, match=True, packrat=False,
+                   memo_size=None, engine='stream'):
+        """Parses a batch of inputs across a pool of worker processes
 
-                result, reconsume = next(grule)
+        Rules can't be pickled, so the parser is sent over to each worker along with
+        the name of the rule, which gets rebuilt there; the parser's class and the
+        inputs have to be picklable. `workers` defaults to the number of CPUs, and
+        inputs are handed out to them `chunksize` at a time.
+
+        Yields the results in the order of `inputs`; with `ordered` turned off they're
+        yielded as they come in instead, as (index, result) pairs. A ParseError for any
+        of the inputs is raised once its result is reached. The rest of the options
+        are the same as for parse().
+        """
+        _compile(rule)
+        name = rule.__name__
+        if getattr(getattr(self, name, None), '__func__', None) is not rule.__func__:
+            raise NotARuleException('the specified rule is not a rule of this parser: %r' % (rule,))
+
+        options = dict(match=match, packrat=packrat, memo_size=memo_size, engine=engine)
+        return _parse_many(self, name, inputs, workers, ordered, chunksize, options)
+
+
+class IncrementalParse(object):
+    """A parse that can be redone after edits, see Parser.parse_incremental()
+
+    `result` is the parse's result, or None if it failed with the ParseError kept in
+    `error`. `reused` is the number of memoized rule results that were carried over
+    from the parse it was redone from.
+    """
+    def __init__(self, rule, text, match, memo, result=None, error=None, reused=0):
+        self.rule = rule
+        self.text = text
+        self.match = match
+        self.memo = memo
+        self.result = result
+        self.error = error
+        self.reused = reused
+
+
+class ParseSession(object):
+    """An incremental parse of a single rule, see Parser.start()
+
+    The rule generators are kept between calls to feed(), so the input can be pushed
+    in as it arrives (e.g. off a socket) without buffering it or blocking on it.
+    Once the rule has completed `done` is set and its result is kept in `result`;
+    with `match` turned off, any input left over after it is kept in `rest`.
+    """
+    def __init__(self, parser, prule, match=True, memo=None, tracer=None, handler=None):
+        self.parser = parser
+        self.rule = prule
+        self.match = match
+        self.memo = memo
+        self.context = ParseContext(parser, memo, tracer=tracer, handler=handler)
+        self.done = False
+        self.result = None
+        self.rest = []
+        self._grule = None
+        self._error = None
+
+    def feed(self, chunk):
+        """Pushes a chunk of input (any iterable of characters) through the rule
+
+        Byte strings and buffers (and the byte values iterating a bytearray gives)
+        are fed as bytes, matching the grammar's characters of the same value the
+        way parse() does with byte buffers.
+
+        Returns the rule's result once it has completed and None until then; check
+        `done` to tell the two apart. Raises ParseError if the input doesn't match.
+        """
+        if self._error is not None:
+            raise self._error
+
+        chars = self._chars(chunk)
+        if not self.done:
+            back = self._run(chars)
+            if not self.done:
+                return None
+            self._leftover(back)
+
+        self._leftover(chars)
+        return self.result
+
+    def _chars(self, chunk):
+        """Iterates over the characters of a chunk, noting whether they're bytes"""
+        if isinstance(chunk, _BINARY):
+            chunk = _bytes(chunk)
+        elif isinstance(chunk, (int, long)):
+            # a single byte, off of an iterated bytearray
+            chunk = chr(chunk)
+        if isinstance(chunk, (bytes, buffer)):
+            self.context.binary = True
+        return iter(chunk)
+
+    def _run(self, chars, back=()):
+        """Runs the rule over the characters in `back`, then those of `chars`, up until
+        it completes or they run out
+
+        Returns the characters the rule completed on without consuming them (as a
+        tuple); whatever follows is left in `chars`.
+        """
+        context = self.context
+        char = context.char
+        prule = self.rule
+        memo = self.memo
+        grule = self._grule
+
+        try:
+            for c in (itertools.chain(back, chars) if len(back) else chars):
+                context.c = c
+                reconsume = True
+                while reconsume:
+                    if grule is None:
+                        grule = prule(char, self.parser)
+
+                    result, reconsume = next(grule)
+                    if result is not None:
+                        break
 
                 if result is not None:
-                    if match:
-                        raise ParseError(got='result (rule returned a result without fully exhausting input)')
-                    else:
-                        return result[0]
+                    grule = None
+                    self._finish(result)
+                    if reconsume:
+                        return c,
+                    context.pos += 1
+                    return ()
 
-        if grule:
-            c = None
-            reconsume = True
+                context.pos += 1
+                if memo is not None:
+                    # nothing can start behind the current character anymore
+                    memo.commit(context.pos)
+        except ParseError as e:
+            raise self._fail(e)
+        finally:
+            self._grule = grule
+
+        return ()
+
+    def close(self):
+        """Signals the end of the input, returning the rule's result
+
+        Raises ParseError if the rule needed more input to complete.
+        """
+        if self._error is not None:
+            raise self._error
+
+        if not self.done:
+            grule = self._grule
+            if grule is None:
+                # nothing was ever fed
+                self.done = True
+                return None
+
+            context = self.context
+            context.c = None
             result = None
-            while reconsume:
-                result, reconsume = next(grule)
-                if result is not None and not match:
-                    return result[0]
-            return result[0]
+            reconsume = True
+            try:
+                while reconsume and result is None:
+                    result, reconsume = next(grule)
+
+                if result is None:
+                    context.fail(context.pos, 'more input')
+                    raise _FAILURE
+            except ParseError as e:
+                raise self._fail(e)
 
+            self._finish(result)
+
+        return self.result
+
+    def _finish(self, result):
+        self.done = True
+        self.result = result[0] if len(result) else None
+        self._grule = None
+
+    def _fail(self, error):
+        self._grule = None
+        self._error = self.context.error(error)
+        return self._error
+
+    def _leftover(self, chars):
+        if not self.match:
+            self.rest.extend(chars)
+            return
+
+        context = self.context
+        for c in chars:
+            context.c = c
+            context.fail(context.pos, '<EOF>')
+            raise self._fail(None)
+
+
+def _compile(rule):
+    if not hasattr(rule, '_rule') or not inspect.ismethod(rule):
+        raise NotARuleException('the specified `rule\' value is not actually a rule: %r' % (rule,))
+    return compile_rule(rule)
+
+
+def _setup(parser, rule, tracer):
+    """Compiles a rule, switching over to the tracer's copy of its graph if the parse is to be traced"""
+    prule = _compile(rule)
+
+    if tracer is None:
+        tracer = parser.tracer
+    if tracer is None and pegasus.rules.DEBUG:
+        tracer = PrintTracer()
+
+    if tracer is not None:
+        prule = tracer.graph(prule)
+    return prule, tracer
+
+
+_BINARY = (bytearray, memoryview, buffer)
+
+
+def _indexed(iterable, engine):
+    """The `(text, binary)` to parse with the indexed engine, or `(None, False)` to stream it"""
+    if engine == 'stream':
+        return None, False
+    if engine != 'indexed':
+        raise ValueError('unknown engine: {!r}; must be \'stream\' or \'indexed\''.format(engine))
+
+    if isinstance(iterable, basestring):
+        return iterable, False
+    if isinstance(iterable, _BINARY):
+        return _bytes(iterable), True
+    raise ValueError('the indexed engine only parses strings and byte buffers, not {}'.format(
+        type(iterable).__name__))
+
+
+def _chunks(iterable):
+    """The chunks to stream an input in; byte buffers go in one piece, rather than by value"""
+    return [iterable] if isinstance(iterable, _BINARY) else iterable
+
+
+def _bytes(data):
+    """Views a byte buffer as a string of bytes, copying it only if there's no other way"""
+    if isinstance(data, memoryview):
+        # memoryviews don't support the old buffer protocol
+        return data.tobytes()
+    return buffer(data)
+
+
+def _parse_text(parser, prule, text, match, memo, binary=False, tracer=None, handler=None):
+    """Parses a string with ordered choice, backtracking on failure"""
+    if not len(text):
         return None
+
+    context = ParseContext(parser, memo, text, binary, tracer, handler)
+    matched = prule.match(context, 0)
+
+    if matched is not None and match and matched[0] != len(text):
+        context.fail(matched[0], '<EOF>')
+        matched = None
+
+    if matched is None:
+        raise context.error()
+
+    result = matched[1]
+    return result[0] if len(result) else None
+
+
+def _parse_incremental(parser, prule, text, match, memo):
+    reused = len(memo)
+    try:
+        result = _parse_text(parser, prule, text, match, memo)
+    except ParseError as e:
+        if not reused:
+            return IncrementalParse(prule, text, match, memo, error=e)
+
+        # reused failures don't record what they expected again, so the error is
+        # only complete when parsing from scratch
+        return _parse_incremental(parser, prule, text, match, IncrementalMemo(memo.lookahead))
+    return IncrementalParse(prule, text, match, memo, result, reused=reused)
+
+
+def _lookahead(root):
+    """How far past the position a rule of the graph fails at it might have looked"""
+    lookahead = 1
+    seen = set()
+    pending = [root]
+    while len(pending):
+        node = pending.pop()
+        if node not in seen:
+            seen.add(node)
+            if isinstance(node, Literal):
+                lookahead = max(lookahead, len(node.utf))
+            pending += node.nodes
+    return lookahead
+
+
+def _parse_stream(parser, prule, iterable, match, memo, tracer=None, handler=None):
+    """Parses an iterable by feeding every character to the rule generators in lockstep"""
+    session = ParseSession(parser, prule, match, memo, tracer, handler)
+
+    for chunk in iterable:
+        session.feed(chunk)
+        if session.done and not match:
+            # don't pull in any more input than the rule needed
+            break
+
+    return session.close()
+
+
+def _iterparse_text(parser, prule, text, packrat, memo_size, binary=False, tracer=None):
+    memo = MemoTable(memo_size) if packrat else None
+    context = ParseContext(parser, memo, text, binary, tracer)
+    pos = 0
+
+    while pos < len(text):
+        matched = prule.match(context, pos)
+        if matched is None:
+            raise context.error()
+
+        if matched[0] == pos:
+            raise ParseError(got='result (rule matched without consuming any input)', position=pos)
+
+        pos = matched[0]
+        if memo is not None:
+            memo.commit(pos)
+        # the documents parsed so far have nothing left to report
+        context.ended = []
+
+        result = matched[1]
+        yield result[0] if len(result) else None
+
+
+def _iterparse_stream(parser, prule, iterable, packrat, memo_size, tracer=None):
+    def start():
+        return ParseSession(parser, prule, False, MemoTable(memo_size) if packrat else None, tracer)
+
+    session = start()
+    for chunk in iterable:
+        chars = session._chars(chunk)
+        back = session._run(chars)
+
+        while session.done:
+            if not session.context.pos:
+                raise ParseError(got='result (rule matched without consuming any input)')
+
+            yield session.result
+
+            # restart right where it completed, going on through the same chunk
+            binary = session.context.binary
+            session = start()
+            session.context.binary = binary
+            back = session._run(chars, back)
+
+    if session._grule is not None:
+        yield session.close()
+
+
+# the worker processes' parser, rule and options, see _parse_many()
+_WORKER = None
+
+
+def _init_worker(parser, name, options):
+    global _WORKER
+    _WORKER = (parser, getattr(parser, name), options)
+
+
+def _parse_task(task):
+    parser, prule, options = _WORKER
+    i, text = task
+    return i, parser.parse(prule, text, **options)
+
+
+def _parse_many(parser, name, inputs, workers, ordered, chunksize, options):
+    pool = multiprocessing.Pool(workers, _init_worker, (parser, name, options))
+    try:
+        tasks = enumerate(inputs)
+        if ordered:
+            for _, result in pool.imap(_parse_task, tasks, chunksize):
+                yield result
+        else:
+            for item in pool.imap_unordered(_parse_task, tasks, chunksize):
+                yield item
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,255 @@
+"""Per-rule profiling
+
+A Profiler is a Tracer (see pegasus.trace) that records, for every @rule method and
+combinator node, how often it was entered, how often it succeeded or failed, how
+many characters it consumed, and how much time was spent in it:
+
+    profiler = Profiler()
+    parser.parse(JsonParser.document, text, tracer=profiler)
+
+    print(profiler.table())
+
+Profiled parses run on the profiler's own copy of the rule graph, made up of
+profiling nodes, so the original graph is never touched and parses without the
+profiler cost nothing extra. Every thread keeps its own stats while it runs, which
+report() adds up, so concurrent parses can share a profiler.
+
+Nodes matched by a regex scanner as part of their parent don't run at all, so
+they don't show up either.
+"""
+from __future__ import unicode_literals
+
+import threading
+from timeit import default_timer as clock
+from pegasus.rules import ParseError, ParserRule, Rule, _COMPILING
+from pegasus.trace import Tracer, _copy
+
+
+_FIELDS = ('calls', 'successes', 'failures', 'chars', 'time', 'self_time')
+
+
+class RuleStats(object):
+    """What a Profiler recorded for a single node"""
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.chars = 0
+        self.time = 0.0
+        self.self_time = 0.0
+        self.active = 0
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in _FIELDS)
+
+
+class _Run(object):
+    """What a Profiler is tracking in a single thread"""
+    def __init__(self):
+        self.stats = {}
+        self.stack = []
+        self.driving = None
+
+
+class Profiler(Tracer):
+    def __init__(self):
+        self.names = {}
+        self._copies = {}
+        self._runs = []
+        self._local = threading.local()
+
+    def graph(self, root):
+        profiled = self._copies.get(root)
+        if profiled is not None:
+            return profiled
+
+        with _COMPILING:
+            profiled = self._copies.get(root)
+            if profiled is None:
+                for node, name in _names(root):
+                    self.names.setdefault(node, name)
+
+                profiled = _copy(root, _profiled)
+                pending = [profiled]
+                while len(pending):
+                    node = pending.pop()
+                    if '_profiler' not in node.__dict__:
+                        node._profiler = self
+                        pending += node.nodes
+                self._copies[root] = profiled
+            return profiled
+
+    @property
+    def stats(self):
+        """The stats recorded by all threads so far, as a {node: RuleStats} dict"""
+        merged = {}
+        for run in list(self._runs):
+            for node, stats in list(run.stats.items()):
+                total = merged.get(node)
+                if total is None:
+                    total = merged[node] = RuleStats(stats.name)
+                for field in _FIELDS:
+                    setattr(total, field, getattr(total, field) + getattr(stats, field))
+        return merged
+
+    def report(self):
+        """Returns the recorded stats as a JSON-friendly {name: {field: value}} dict"""
+        return dict((stats.name, stats.as_dict()) for stats in self.stats.values())
+
+    def table(self, sort='self_time', limit=None):
+        """Formats the recorded stats as a table, sorted by one of its columns (descending)"""
+        if sort not in _FIELDS:
+            raise ValueError('cannot sort by {}; must be one of: {}'.format(sort, ', '.join(_FIELDS)))
+
+        rows = sorted((stats for stats in self.stats.values() if stats.calls),
+                      key=lambda stats: getattr(stats, sort), reverse=True)
+        if limit is not None:
+            rows = rows[:limit]
+
+        lines = ['{:>10} {:>10} {:>10} {:>10} {:>10} {:>10}  {}'.format(
+            'calls', 'successes', 'failures', 'chars', 'time', 'self time', 'rule')]
+        for stats in rows:
+            lines.append('{:>10} {:>10} {:>10} {:>10} {:>10.6f} {:>10.6f}  {}'.format(
+                stats.calls, stats.successes, stats.failures, stats.chars, stats.time, stats.self_time, stats.name))
+        return '\n'.join(lines)
+
+    def _run(self):
+        run = getattr(self._local, 'run', None)
+        if run is None:
+            run = self._local.run = _Run()
+            with _COMPILING:
+                self._runs.append(run)
+        return run
+
+    def _stats(self, run, node):
+        stats = run.stats.get(node)
+        if stats is None:
+            stats = run.stats[node] = RuleStats(self.names.get(node, repr(node)))
+        return stats
+
+    def _enter(self, run, node):
+        stats = self._stats(run, node)
+        stats.active += 1
+        run.stack.append(0.0)
+        return stats, clock()
+
+    def _exit(self, run, stats, start):
+        elapsed = clock() - start
+        children = run.stack.pop()
+        if len(run.stack):
+            run.stack[-1] += elapsed
+
+        stats.active -= 1
+        stats.self_time += elapsed - children
+        if not stats.active:
+            # only the outermost of recursive runs counts towards the cumulative time
+            stats.time += elapsed
+
+    def _match(self, node, match, context, pos):
+        run = self._run()
+        if match.__func__ is Rule.match.__func__:
+            # it drives the node's own generator, which is counted below
+            run.driving = node
+
+        stats, start = self._enter(run, node)
+        try:
+            matched = match(context, pos)
+        finally:
+            self._exit(run, stats, start)
+
+        stats.calls += 1
+        if matched is None:
+            stats.failures += 1
+        else:
+            stats.successes += 1
+            stats.chars += matched[0] - pos
+        return matched
+
+    def _call(self, node, grule):
+        run = self._run()
+        if run.driving is node:
+            run.driving = None
+            return grule
+        return self._steps(node, grule)
+
+    def _steps(self, node, grule):
+        # every step runs start to finish, so the thread's stack is back where it
+        # was in between, even with other parses' steps running in the meantime
+        run = self._run()
+        self._stats(run, node).calls += 1
+
+        while True:
+            stats, start = self._enter(run, node)
+            try:
+                result, reconsume = next(grule)
+            except ParseError:
+                stats.failures += 1
+                raise
+            finally:
+                self._exit(run, stats, start)
+
+            if not reconsume:
+                stats.chars += 1
+            if result is not None:
+                stats.successes += 1
+
+            yield result, reconsume
+
+            if result is not None:
+                break
+
+
+_PROFILED = {}
+
+
+def _profiled(cls):
+    """Returns the profiling subclass of a node class"""
+    profiled = _PROFILED.get(cls)
+    if profiled is None:
+        def __call__(self, char, parser):
+            return self._profiler._call(self._original, cls.__call__(self, char, parser))
+
+        def match(self, context, pos):
+            return self._profiler._match(self._original, super(profiled, self).match, context, pos)
+
+        profiled = _PROFILED[cls] = type(cls.__name__, (cls,), {
+            '__module__': cls.__module__,
+            '__call__': __call__,
+            'match': match,
+        })
+    return profiled
+
+
+def _names(root, width=60):
+    """Walks a node graph, naming every node after the @rule it's part of"""
+    names = {}
+    seen = set()
+    pending = [(root, None)]
+
+    while len(pending):
+        node, owner = pending.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+
+        if isinstance(node, ParserRule):
+            owner = repr(node)
+            name = owner
+        else:
+            name = repr(node)
+            if len(name) > width:
+                name = name[:width - 3] + '...'
+            if owner is not None:
+                name = '{}: {}'.format(owner, name)
+
+        if name in names.values():
+            counter = 2
+            while '{} #{}'.format(name, counter) in names.values():
+                counter += 1
+            name = '{} #{}'.format(name, counter)
+
+        names[node] = name
+        pending += [(child, owner) for child in reversed(node.nodes)]
+
+    return names.items()
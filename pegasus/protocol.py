@@ -0,0 +1,79 @@
+"""Event loop integration
+
+A ParseSession is fed whatever input it's given, whenever it's given it, so it can
+be driven straight from the data callbacks of an event loop. ParseProtocol does
+just that, using the callback names of asyncio-style protocols (e.g. trollius'):
+each chunk is parsed as it arrives, nothing blocks the loop and nothing is
+buffered on the way in.
+"""
+from __future__ import unicode_literals
+
+from pegasus.rules import ParseError
+
+
+class ParseProtocol(object):
+    """An asyncio-style protocol parsing a rule off of the data it receives
+
+    `on_result(result)` is called once the rule has completed; with `match` that's
+    at the end of the input, otherwise as soon as the rule completes. Parse errors
+    are passed to `on_error(error)` and the transport is closed; without an
+    `on_error` they're raised out of the callback that received the data instead.
+    The rest of the options are the same as for Parser.parse().
+    """
+    def __init__(self, parser, rule, on_result, on_error=None, match=True, packrat=False, memo_size=None):
+        self.session = parser.start(rule, match=match, packrat=packrat, memo_size=memo_size)
+        self.on_result = on_result
+        self.on_error = on_error
+        self.transport = None
+        self.finished = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.finished:
+            return
+
+        session = self.session
+        try:
+            session.feed(data)
+        except ParseError as e:
+            self._error(e)
+            return
+
+        if session.done and not session.match:
+            self._finish(session.result)
+
+    def eof_received(self):
+        if self.finished:
+            return
+
+        try:
+            result = self.session.close()
+        except ParseError as e:
+            self._error(e)
+            return
+
+        self._finish(result)
+
+    def connection_lost(self, exc):
+        if self.finished:
+            return
+
+        if exc is None:
+            self.eof_received()
+        else:
+            self._error(exc)
+
+    def _finish(self, result):
+        self.finished = True
+        self.on_result(result)
+
+    def _error(self, error):
+        self.finished = True
+        if self.transport is not None:
+            self.transport.close()
+
+        if self.on_error is None:
+            raise error
+        self.on_error(error)
@@ -30,75 +30,79 @@ Here are how rules work:
 
     It is expected that upon a rule generator being initialized that it should read the current character.
     This is why Seq() iterates through rules via a generator rather than a list.
+
+Rules are nodes:
+
+    Every combinator (Seq, Or, Opt, ...) is a Rule instance - calling it with `(char, parser)` returns
+    the parser generator described above. Nodes hold onto the child rules they were given (strings, lists,
+    tuples, Lazy references, @rule methods, ...) and build them into nodes when they're constructed. Lazy
+    references are resolved when the node graph is compiled (see Rule.compile()), which happens once,
+    before the first parse. From then on the same graph is reused for every parse.
 """
-import inspect
+import re
+import sys
+import threading
+from pegasus.memo import MemoEntry
 from pegasus.util import flatten
 
 
 DEBUG = False
-__dbgdepth = 0
 
 
 def set_debug(debug=True):
+    """Turns printing traces of every parse on or off (see pegasus.trace.PrintTracer)
+
+    Takes effect for any parse started from then on that doesn't have a tracer of
+    its own.
+    """
     global DEBUG
     DEBUG = debug
 
 
-def debuggable(name=None):
-    def _wrap(fn):
-        if not DEBUG:
-            return fn
-
-        _name = name if name else fn.__name__
-
-        def _inner(char, *args, **kwargs):
-            global __dbgdepth
-
-            gen = fn(char, *args, **kwargs)
-
-            depth = ' ' * __dbgdepth
-            while True:
-                try:
-                    print 'pegasus: {}\x1b[2;38;5;241menter {} -> {}\x1b[m'.format(depth, repr(char()), _name)
-                    __dbgdepth += 1
-                    result, reconsume = next(gen)
-                    if result is not None:
-                        print 'pegasus: {}\x1b[1;38;5;126mresult {} -> {} ==> {} (reconsume={})\x1b[m'.format(depth, repr(char()), _name, result, reconsume)
-                    yield result, reconsume
-                except Exception as e:
-                    print 'pegasus: {}\x1b[38;5;88mfail {} -> {}\t{}\x1b[m'.format(depth, repr(char()), _name, str(e))
-                    raise
-                finally:
-                    print 'pegasus: {}\x1b[2;38;5;241mexit {} -> {}\x1b[m'.format(depth, repr(char()), _name)
-                    __dbgdepth -= 1
-
-        return _inner
-    return _wrap
-
-
 class BadRuleException(Exception):
     """Thrown if a rule was invalid, due to a bad type usually"""
     pass
 
 
 class ParseError(Exception):
-    """Thrown in the event there was a problem parsing the input string"""
-    def __init__(self, got=None, expected=None):
-        self.got = got
-        self.expected = expected if expected else []
+    """Thrown in the event there was a problem parsing the input string
 
+    The message is only put together once it's actually asked for.
+    """
+    def __init__(self, got=None, expected=None, position=None):
+        super(ParseError, self).__init__(got, expected, position)
+        self.got = got
+        self.position = position
+        self._expected = expected
+        self._errors = None
+
+    @property
+    def expected(self):
+        if self._errors is not None:
+            expected = []
+            for error in self._errors:
+                for exp in error.expected:
+                    expected.append('{} but got \'{}\' instead'.format(exp, error.got))
+
+            self._expected = expected
+            self._errors = None
+
+        return self._expected if self._expected else []
+
+    def __str__(self):
+        got = self.got
+        expected = self.expected
         rgot = repr(got)
-        if got is not None and expected is None or len(expected) == 0:
-            message = 'unexpected: {}'.format(rgot)
-        elif got is None and expected is not None and len(expected):
+
+        if not len(expected):
+            message = 'unexpected: {}'.format(rgot) if got is not None else 'unknown parse error'
+        elif got is None:
             if len(expected) == 1:
                 message = 'expected: {}'.format(expected[0])
             else:
                 message = 'expected one of the following:'
                 for e in expected:
                     message += '\n- {}'.format(e)
-        elif got is None and expected is None:
-            message = 'unknown parse error'
         else:
             if len(expected) == 1:
                 message = 'got: {}, expected: {}'.format(rgot, expected[0])
@@ -107,45 +111,218 @@ class ParseError(Exception):
                 for e in expected:
                     message += '\n- {}'.format(e)
 
-        super(ParseError, self).__init__(message)
+        if self.position is not None:
+            message = 'at position {}: {}'.format(self.position, message)
+
+        return message
 
     @classmethod
     def combine(cls, errors):
+        error = cls()
+        error._errors = errors
+        return error
+
+
+# Raised by rules running with a parse context; what was expected
+# is recorded on the context instead of on the exception.
+_FAILURE = ParseError()
+
+
+class ParseContext(object):
+    """State belonging to a single parse
+
+    When streaming, Parser.parse() hands `context.char` to the rules as their `char`
+    callable; rules that need the rest of the state get to it through `char.__self__`.
+
+    When the whole input is available, `text` holds it and the rules' match() methods
+    work on positions into it. With `binary`, `text` is a byte buffer and the
+    terminals match it with the byte forms of their characters (see _latin1()).
+    Sessions fed bytes set `binary` too, for the streamed bytes to match the same way.
+
+    Either way, failing rules record what they expected with fail(); only the furthest
+    failures are kept, and they're only turned into a ParseError (see error()) if the
+    parse as a whole fails. `ended` holds the scanned matches whose failures are
+    only worth recording then (see _ended()).
+
+    `tracer` is the Tracer that the traced copy of the rule graph reports to, if the
+    parse runs on one (see pegasus.trace).
+
+    `cut` is set once a Cut() has been passed, until the Or() it commits sees it.
+
+    `handler` is the EventHandler that event mode repetitions hand their items to,
+    if the parse has one (see pegasus.events).
+
+    `scan` tells whether or not rules may match with their regex scanners, and
+    `reach` is how far into the input the current rule has looked so far, which
+    only matters to memo tables that keep track of it (see IncrementalMemo).
+    """
+    def __init__(self, parser=None, memo=None, text=None, binary=False, tracer=None, handler=None):
+        self.parser = parser
+        self.memo = memo
+        self.text = text
+        self.binary = binary
+        self.tracer = tracer
+        self.handler = handler
+        self.length = len(text) if text is not None else 0
+        self.scan = memo is None or memo.scan
+        self.reach = 0
+        self.cut = False
+        self.c = None
+        self.pos = 0
+        self.furthest = -1
+        self.expected = []
+        self.got = None
+        self.ended = []
+
+    def char(self):
+        return self.c
+
+    def fail(self, pos, *expected):
+        """Records a failed match at `pos`, keeping only the furthest failures"""
+        if pos > self.furthest:
+            self.furthest = pos
+            self.expected = list(expected)
+            self.got = self.c
+        elif pos == self.furthest:
+            self.expected.extend(expected)
+
+    def error(self, error=None):
+        """Builds the ParseError for the furthest failure
+
+        `error` is the exception that ended the parse, if any; unless it's the
+        usual failure signal, it's recorded at the current position first.
+        """
+        # reruns don't hand anything to the handler: their results are thrown away
+        self.handler = None
+        for rule, pos in self.ended:
+            rule.match(self, pos)
+        self.ended = []
+
+        if error is not None and error is not _FAILURE:
+            self.fail(self.pos, *(error.expected or [str(error)]))
+
         expected = []
-        for error in errors:
-            if not len(error.expected):
-                continue
-            for exp in error.expected:
-                expected.append('{} but got \'{}\' instead'.format(exp, error.got))
+        for exp in self.expected:
+            if exp not in expected:
+                expected.append(exp)
+
+        pos = max(self.furthest, 0)
+        if self.text is not None:
+            got = self.text[pos] if pos < self.length else '<EOF>'
+        else:
+            got = self.got if self.got is not None else '<EOF>'
 
-        return ParseError(expected=expected)
+        return ParseError(got=got, expected=expected, position=pos)
+
+
+def _latin1(chars):
+    """The byte form of a grammar string; characters map to the bytes of the same value
+
+    Returns None if the string holds characters that don't fit in a byte.
+    """
+    if isinstance(chars, str):
+        return chars
+
+    try:
+        return chars.encode('latin-1')
+    except UnicodeEncodeError:
+        return None
+
+
+def _context(char):
+    return getattr(char, '__self__', None)
+
+
+def _binary(char):
+    """Whether the characters streamed through `char` are bytes (see ParseContext.binary)"""
+    context = _context(char)
+    if context is not None:
+        return context.binary
+    return isinstance(char(), bytes)
+
+
+def _failed(char, *expected):
+    """Records a failure at the current character, returning the exception to raise
+
+    With a parse context that's the shared failure signal. Rules driven with a
+    plain `char` callable get a ParseError of their own.
+    """
+    context = _context(char)
+    if context is None:
+        return ParseError(got=char() or '<EOF>', expected=list(expected))
+
+    if len(expected):
+        context.fail(context.pos, *expected)
+    return _FAILURE
 
 
 class Lazy(object):
-    _LOOKUPS = {}
+    """A reference to a @rule method that isn't defined yet, by name
 
+    References used in a Parser subclass' rules are bound to the class once it's
+    defined (see bind()) and resolve to its rule of that name; any others resolve
+    to a rule of that name in the module they were created in.
+    """
     def __init__(self, name):
         self.name = name
-        stack = inspect.stack()[1]
-        self.module = stack[3]
-        self.file = stack[1]
+        self.owner = None
+        self.scope = sys._getframe(1).f_globals
+
+    def bind(self, owner):
+        if self.owner is None:
+            self.owner = owner
 
     def resolve(self):
-        if (self.file, self.module, self.name) not in Lazy._LOOKUPS:
-            raise BadRuleException('could not resolve lazily loaded rule: {}.{}'.format(self.module, self.name))
+        if self.owner is not None:
+            rule = getattr(self.owner, self.name, None)
+            where = self.owner.__name__
+        else:
+            rule = self.scope.get(self.name)
+            where = self.scope.get('__name__')
+
+        if not hasattr(rule, '_rule'):
+            raise BadRuleException('could not resolve lazily loaded rule: {}.{}'.format(where, self.name))
 
-        return Lazy._LOOKUPS[(self.file, self.module, self.name)]
+        return rule
+
+
+def _bind_lazy(rules, owner):
+    """Binds the Lazy references in (unbuilt or built) rules to a Parser subclass
+
+    Other @rule methods aren't descended into; their own classes bind them.
+    """
+    pending = list(rules)
+    seen = set()
+    while len(pending):
+        rule = pending.pop()
+        if isinstance(rule, Lazy):
+            rule.bind(owner)
+        elif isinstance(rule, (list, tuple)):
+            pending += rule
+        elif isinstance(rule, Rule) and not isinstance(rule, ParserRule) and id(rule) not in seen:
+            seen.add(id(rule))
+            pending += rule.nodes
 
 
 def _build_rule(rule):
-    if isinstance(rule, Lazy):
-        rule = rule.resolve()
+    """Builds a rule (string, list, tuple, @rule method, ...) into a node
+
+    Lazy references are returned as-is; they're resolved once the graph
+    they're part of is compiled.
+    """
+    if isinstance(rule, (Rule, Lazy)):
+        return rule
 
     if callable(rule):
         if hasattr(rule, '_rule'):
-            # it's a class rule that has a transformation step
-            return ParserRule(rule, getattr(rule, '_rule'))
-        return rule
+            # it's a class rule that has a transformation step;
+            # there is only ever one node per rule method.
+            fn = getattr(rule, '__func__', rule)
+            node = fn.__dict__.get('_node')
+            if node is None:
+                node = fn._node = ParserRule(fn, fn._rule)
+            return node
+        return GeneratorRule(rule)
 
     if type(rule) in [str, unicode]:
         return Literal(rule)
@@ -163,22 +340,218 @@ def _build_rule(rule):
     raise BadRuleException('rule has invalid type: {}'.format(repr(rule)))
 
 
-@debuggable('EOF')
-def EOF(char, parser):
-    """Fails if the given character is not None"""
-    if char() is not None:
-        raise ParseError(got=char(), expected=['<EOF>'])
+# held while building and compiling graphs, so that concurrent first parses
+# of a grammar don't see it half compiled
+_COMPILING = threading.RLock()
+
+
+def compile_rule(rule, check=True):
+    """Builds and compiles a rule, returning the root node of its graph"""
+    # once a graph is compiled in full it's never written to again, so only the first parses need the lock
+    node = rule if isinstance(rule, Rule) else getattr(getattr(rule, '__func__', rule), '_node', None)
+    if node is not None and node.ready:
+        return node
+
+    with _COMPILING:
+        node = _build_rule(rule)
+        if isinstance(node, Lazy):
+            node = _build_rule(node.resolve())
+        if isinstance(node, Rule):
+            node.compile(check)
+        return node
+
+
+class Rule(object):
+    """Base class for all rule nodes
+
+    `nodes` holds the (built) child rules; it may contain Lazy references
+    up until the node is compiled. `compiled` is set as soon as compiling the
+    node starts, `ready` once the whole graph it's part of is compiled.
+
+    Besides being called as a parser generator, a node can match() the input at
+    a position when all of it is available up front. match() returns a tuple of
+    `(end position, result)` if the rule matches, or None if it doesn't.
+    """
+    nodes = ()
+    compiled = False
+    ready = False
+    scanner = None
+    first = None
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__.lstrip('_'), ', '.join(repr(node) for node in self.nodes))
+
+    def compile(self, check=True):
+        """Resolves Lazy references and compiles all child nodes (only once)
+
+        With `check`, the newly compiled part of the graph is checked for problems
+        (see pegasus.check).
+        """
+        with _COMPILING:
+            if not self.compiled:
+                compiled = []
+                self._resolve(compiled)
+
+                # the whole graph is resolved by now, so nodes are free to look
+                # as deep into it as they need to.
+                for node in compiled:
+                    node.prepare()
+
+                if check:
+                    from pegasus.check import _compiled
+                    _compiled(self, compiled)
+
+                for node in compiled:
+                    node.ready = True
+
+        return self
+
+    def _resolve(self, compiled):
+        self.compiled = True
+        compiled.append(self)
+        self.nodes = tuple(_build_rule(node.resolve()) if isinstance(node, Lazy) else node for node in self.nodes)
+        for node in self.nodes:
+            if not node.compiled:
+                node._resolve(compiled)
+
+    def prepare(self):
+        """Called once the whole graph the node is part of has been resolved"""
+        pass
+
+    def match(self, context, pos):
+        """Matches by feeding the parser generator one character at a time"""
+        text = context.text
+        feed = ParseContext(context.parser, text=text, binary=context.binary, tracer=context.tracer,
+                            handler=context.handler)
+        feed.pos = pos
+        char = feed.char
+        grule = self(char, context.parser)
+
+        try:
+            while feed.pos <= context.length:
+                feed.c = text[feed.pos] if feed.pos < context.length else None
+                reconsume = True
+                while reconsume:
+                    result, reconsume = next(grule)
+                    if result is not None:
+                        context.reach = max(context.reach, feed.pos + 1)
+                        return min(feed.pos if reconsume else feed.pos + 1, context.length), result
+
+                feed.pos += 1
+        except ParseError as e:
+            if e is not _FAILURE:
+                feed.fail(feed.pos, *(e.expected or [str(e)]))
+            context.fail(feed.furthest, *feed.expected)
+            return None
+
+        context.fail(context.length, 'more input')
+        return None
+
+
+class GeneratorRule(Rule):
+    """Wraps a plain parser generator function"""
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __repr__(self):
+        return self.fn.__name__
+
+    def __call__(self, char, parser):
+        return self.fn(char, parser)
+
+
+class __EOF(Rule):
+    def __repr__(self):
+        return 'EOF'
+
+    def __call__(self, char, parser):
+        """Fails if the given character is not None"""
+        if char() is not None:
+            raise _failed(char, '<EOF>')
+
+        yield (), False
+
+    def match(self, context, pos):
+        if pos < context.length:
+            context.fail(pos, '<EOF>')
+            return None
+        return pos, ()
 
-    yield (), False
+EOF = __EOF()
 
 
-def ParserRule(class_rule, parse_rule):
+class Cut(Rule):
+    """Commits the enclosing Or() to the alternative it's part of
+
+    Once the parse gets to it, the innermost Or() it's (dynamically) part of, even
+    through other @rule methods, drops all of its other alternatives: if the rest
+    of the alternative fails, the Or() fails. Memo entries behind it are dropped,
+    too. Matches nothing.
+    """
+    def __repr__(self):
+        return 'Cut()'
+
+    def __call__(self, char, parser):
+        context = _context(char)
+        if context is not None:
+            context.cut = True
+            if context.memo is not None:
+                context.memo.commit(context.pos)
+        yield (), True
+
+    def match(self, context, pos):
+        context.cut = True
+        if context.memo is not None:
+            context.memo.commit(pos)
+        return pos, ()
+
+
+def _has_cut(rule):
+    """Whether or not a Cut() can be reached from a rule other than through an Or()"""
+    seen = set()
+    pending = list(rule.nodes)
+    while len(pending):
+        node = pending.pop()
+        if node in seen or isinstance(node, Or):
+            continue
+        if isinstance(node, Cut):
+            return True
+
+        seen.add(node)
+        pending += node.nodes
+
+    return False
+
+
+class ParserRule(Rule):
     """Calls a transformation step class_rule if the parse_rule succeeds"""
-    rule = _build_rule(parse_rule)
+    cuts = False
+
+    def __init__(self, class_rule, parse_rule):
+        self.class_rule = class_rule
+        self.nodes = (_build_rule(parse_rule),)
 
-    @debuggable('ParserRule')
-    def _iter(char, parser):
-        grule = rule(char, parser)
+    def __repr__(self):
+        return self.class_rule.__name__
+
+    def __call__(self, char, parser):
+        context = _context(char)
+        if context is None or context.memo is None:
+            return self._iter(char, parser)
+
+        memo = context.memo
+        entry = memo.get(self, context.pos)
+        if entry is None:
+            entry = MemoEntry(self._iter(char, parser))
+            memo.put(self, context.pos, entry)
+        return entry.replay(context)
+
+    def prepare(self):
+        self.cuts = _has_cut(self)
+
+    def _iter(self, char, parser):
+        class_rule = self.class_rule
+        grule = self.nodes[0](char, parser)
 
         while True:
             result, reconsume = next(grule)
@@ -189,18 +562,81 @@ def ParserRule(class_rule, parse_rule):
 
             yield None, reconsume
 
-    return _iter
+    def match(self, context, pos):
+        memo = context.memo
+        if memo is None:
+            return self._match(context, pos)
+        if memo.reaches is not None:
+            return self._match_tracked(context, pos, memo)
+        return self._memoized(context, pos, memo)
+
+    def _match_tracked(self, context, pos, memo):
+        """Matches through the memo table, keeping track of how far into the input each run looks"""
+        reach = memo.reaches.get((self, pos))
+        if reach is not None:
+            matched = self._memoized(context, pos, memo)
+        else:
+            outer, context.reach = context.reach, 0
+            matched = self._memoized(context, pos, memo)
+
+            end = matched[0] if matched is not None else pos
+            reach = max(context.reach, context.furthest + memo.lookahead, end + 1 if end >= context.length else end)
+            memo.reaches[(self, pos)] = reach
+            context.reach = outer
+
+        if reach > context.reach:
+            context.reach = reach
+        return matched
+
+    def _memoized(self, context, pos, memo):
+        entry = memo.get(self, pos)
+        if entry is not None:
+            if self.cuts:
+                # whether or not the run passed a Cut() is part of its outcome
+                entry, cut = entry
+                context.cut = context.cut or cut
+            return entry or None
+
+        if self.cuts:
+            outer = context.cut
+            context.cut = False
+            matched = self._match(context, pos)
+            memo.put(self, pos, (matched or False, context.cut))
+            context.cut = outer or context.cut
+        else:
+            matched = self._match(context, pos)
+            memo.put(self, pos, matched or False)
+
+        return matched
 
+    def _match(self, context, pos):
+        matched = self.nodes[0].match(context, pos)
+        if matched is not None:
+            result = self.class_rule(context.parser, *matched[1])
+            matched = matched[0], ((result,) if result is not None else ())
+        return matched
 
-def Literal(utf):
+
+class Literal(Rule):
     """Matches an exact string literal"""
-    if type(utf) == str:
-        utf = unicode(utf)
+    def __init__(self, utf):
+        if type(utf) == str:
+            utf = unicode(utf)
+
+        self.utf = utf
+        self.raw = _latin1(utf)
+        self.expected = repr(utf)
 
-    length = len(utf)
+    def __repr__(self):
+        return repr(self.utf)
+
+    def __call__(self, char, parser):
+        utf = self.raw if _binary(char) else self.utf
+        if utf is None:
+            # it doesn't fit in bytes
+            raise _failed(char, self.expected)
+        length = len(utf)
 
-    @debuggable('Literal')
-    def _iter(char, parser):
         for i in xrange(length):
             c = utf[i]
             if char() and c == char():
@@ -208,52 +644,168 @@ def Literal(utf):
                     break
                 yield None, None
             else:
-                raise ParseError(got=char() or '<EOF>', expected=['{} (in literal {})'.format(repr(c), repr(utf))])
+                raise _failed(char, self.expected)
 
         yield (utf,), False
 
-    return _iter
-
-
-def Or(*rules):
-    """Matches the first succeeding rule"""
-
-    @debuggable('Or')
-    def _iter(char, parser):
-        remaining = [_build_rule(rule)(char, parser) for rule in rules]
-        errors = []
+    def match(self, context, pos):
+        end = pos + len(self.utf)
+        literal = self.raw if context.binary else self.utf
+        if context.text[pos:end] == literal:
+            return end, (literal,)
+
+        context.fail(pos, self.expected)
+        return None
+
+
+class Or(Rule):
+    """Matches the first succeeding rule
+
+    Alternatives that can't start with the current character (judging by their FIRST
+    sets) are skipped altogether; `table` maps characters to the alternatives worth
+    trying for them, along with the descriptions of the ones that were skipped.
+
+    Once an alternative passes a Cut() (`cuts` tells if any of them can), the
+    other alternatives are dropped.
+
+    An Or() made up of nothing but (non-inverted) single character classes, like
+    `[C['0':'9'], C['a':'f']]`, is matched with a single `charclass` test instead.
+    """
+    table = None
+    cuts = False
+    charclass = None
+
+    def __init__(self, *rules):
+        self.nodes = tuple(_build_rule(rule) for rule in rules)
+
+    def prepare(self):
+        self.cuts = _has_cut(self)
+
+        firsts = [_first(node) for node in self.nodes]
+        chars = set()
+        for first, nullable in firsts:
+            if first is not None and not nullable:
+                chars.update(first)
+
+        if len(chars) and len(chars) <= _MAX_FIRST:
+            def dispatch(c):
+                candidates = tuple(node for node, (first, nullable) in zip(self.nodes, firsts)
+                                   if first is None or nullable or c in first)
+                skipped = [repr(node) for node in self.nodes if node not in candidates]
+                return candidates, skipped
+
+            self.table = dict((c, dispatch(c)) for c in chars)
+            self.default = dispatch(None)
+            self.btable = dict((_latin1(c), entry) for c, entry in self.table.items() if _latin1(c) is not None)
+
+        # merged whether or not there's a table: classes too wide for one merge all the same
+        members = _members(self)
+        if members is not None:
+            self.charclass = _CharClass(*members)
+            self.rcharclass = self.charclass.latin1()
+            # what trying each alternative in turn would have reported
+            self.failures = tuple(self.default[1] if self.table is not None else
+                                  (repr(node) for node in self.nodes))
+
+    def __call__(self, char, parser):
+        if self.charclass is not None:
+            c = char()
+            if c is not None and c in (self.rcharclass if _binary(char) else self.charclass):
+                yield (c,), False
+            raise _failed(char, *self.failures)
+
+        rules = self.nodes
+
+        if self.table is not None:
+            table = self.btable if _binary(char) else self.table
+            rules, skipped = table.get(char(), self.default)
+            if len(skipped):
+                _failed(char, *skipped)
+
+        remaining = [rule(char, parser) for rule in rules]
+        context = _context(char) if self.cuts else None
 
         while len(remaining):
             for rule in list(remaining):
+                if rule not in remaining:
+                    continue  # dropped by a cut earlier in this step
+
                 reconsume = True
                 while reconsume:
+                    cut = False
                     try:
-                        result, reconsume = next(rule)
+                        if context is None:
+                            result, reconsume = next(rule)
+                        else:
+                            outer, context.cut = context.cut, False
+                            try:
+                                result, reconsume = next(rule)
+                            finally:
+                                cut, context.cut = context.cut, outer
+                            if cut:
+                                # committed to this one: the ones after it are out
+                                remaining = remaining[:remaining.index(rule) + 1]
                         if result is not None:
                             yield result, reconsume
                             raise StopIteration()
-                    except ParseError as e:
-                        errors.append(e)
-                        remaining.remove(rule)
+                    except ParseError:
+                        if cut:
+                            # it failed past its cut; only the ones before it are left
+                            remaining = remaining[:remaining.index(rule)]
+                        else:
+                            remaining.remove(rule)
                         break
 
             if len(remaining):
                 yield None, False
 
-        raise ParseError.combine(errors)
+        raise _failed(char)
+
+    def match(self, context, pos):
+        if self.charclass is not None:
+            if pos < context.length:
+                c = context.text[pos]
+                if c in (self.rcharclass if context.binary else self.charclass):
+                    return pos + 1, (c,)
+            context.fail(pos, *self.failures)
+            return None
+
+        rules = self.nodes
+        if self.table is not None:
+            table = self.btable if context.binary else self.table
+            rules, skipped = table.get(context.text[pos], self.default) if pos < context.length else self.default
+            if len(skipped):
+                context.fail(pos, *skipped)
+
+        if not self.cuts:
+            for rule in rules:
+                matched = rule.match(context, pos)
+                if matched is not None:
+                    return matched
+            return None
+
+        outer = context.cut
+        matched = None
+        for rule in rules:
+            context.cut = False
+            matched = rule.match(context, pos)
+            if matched is not None or context.cut:
+                break
 
-    return _iter
+        context.cut = outer
+        return matched
 
 
-def Seq(*rules):
-    total = len(rules)
+class Seq(Rule):
+    def __init__(self, *rules):
+        self.nodes = tuple(_build_rule(rule) for rule in rules)
 
-    @debuggable('Seq')
-    def _iter(char, parser):
+    def __call__(self, char, parser):
+        total = len(self.nodes)
         results = ()
 
         counter = 0
-        for rule in (_build_rule(rule)(char, parser) for rule in rules):
+        for rule in (rule(char, parser) for rule in self.nodes):
             counter += 1
             while True:
                 result, reconsume = next(rule)
@@ -269,21 +821,57 @@ def Seq(*rules):
 
         yield results, reconsume
 
-    return _iter
+    def match(self, context, pos):
+        results = ()
+        for rule in self.nodes:
+            matched = rule.match(context, pos)
+            if matched is None:
+                return None
 
+            pos, result = matched
+            results += result
 
-class __ChrRange(object):
-    def __call__(self, begin, end, inverse=False):
-        inverse = inverse is True
-        rng = xrange(ord(unicode(begin)[0]), ord(unicode(end)[0]) + 1)
+        return pos, results
 
-        @debuggable('ChrRange')
-        def _iter(char, parser):
-            if char() is not None and (ord(char()) in rng) is not inverse:
-                yield (char(),), False
-            raise ParseError(got=char() or '<EOF>', expected=['character in class [{}-{}]'.format(repr(unicode(begin)[0]), repr(unicode(end)[0]))])
 
-        return _iter
+class _ChrRange(Rule):
+    def __init__(self, begin, end, inverse=False):
+        self.begin = unicode(begin)[0]
+        self.end = unicode(end)[0]
+        self.inverse = inverse is True
+        self.rng = xrange(ord(self.begin), ord(self.end) + 1)
+
+        # the range's bytes; an empty one if it's entirely out of their range
+        lo, hi = ord(self.begin), min(ord(self.end), 0xff)
+        self.rbegin, self.rend = (chr(lo), chr(hi)) if lo <= hi else (b'\x01', b'\x00')
+        self.expected = 'character in class [{}-{}]'.format(repr(self.begin), repr(self.end))
+
+    def __repr__(self):
+        return 'ChrRange[{!r}:{!r}{}]'.format(self.begin, self.end, ':True' if self.inverse else '')
+
+    def __call__(self, char, parser):
+        c = char()
+        # by value, so that streamed bytes compare like characters
+        if c is not None and (ord(c) in self.rng) is not self.inverse:
+            yield (c,), False
+        raise _failed(char, self.expected)
+
+    def match(self, context, pos):
+        if pos < context.length:
+            c = context.text[pos]
+            if context.binary:
+                if (self.rbegin <= c <= self.rend) is not self.inverse:
+                    return pos + 1, (c,)
+            elif (self.begin <= c <= self.end) is not self.inverse:
+                return pos + 1, (c,)
+
+        context.fail(pos, self.expected)
+        return None
+
+
+class __ChrRange(object):
+    def __call__(self, begin, end, inverse=False):
+        return _ChrRange(begin, end, inverse)
 
     def __getitem__(self, slicee):
         if type(slicee) != slice:
@@ -294,12 +882,12 @@ class __ChrRange(object):
 ChrRange = __ChrRange()
 
 
-def Opt(*rules):
-    rule = _build_rule(rules)
+class Opt(Rule):
+    def __init__(self, *rules):
+        self.nodes = (_build_rule(rules),)
 
-    @debuggable('Opt')
-    def _iter(char, parser):
-        grule = rule(char, parser)
+    def __call__(self, char, parser):
+        grule = self.nodes[0](char, parser)
 
         try:
             while True:
@@ -312,15 +900,46 @@ def Opt(*rules):
         except ParseError:
             yield (), True
 
-    return _iter
+    def prepare(self):
+        if _is_char(self.nodes[0]) or (isinstance(self.nodes[0], Plus) and _is_char(self.nodes[0].nodes[0])):
+            self.scanner = _scanner(self)
+
+    def match(self, context, pos):
+        if self.scanner is not None and context.scan:
+            end = self.scanner(context.text, pos).end()
+            _ended(self, context, pos, end)
+            if end == pos:
+                return pos, ()
+            if isinstance(self.nodes[0], Plus):
+                return end, tuple(zip(context.text[pos:end]))
+            return end, (context.text[pos:end],)
 
+        return self.nodes[0].match(context, pos) or (pos, ())
 
-def Plus(*rules):
-    rule = _build_rule(rules)
 
-    @debuggable('Plus')
-    def _iter(char, parser):
+class Plus(Rule):
+    """Matches its rules one or more times, returning each iteration's results
+
+    With `events` (a name), and a parse that has an event handler, the iterations'
+    results are handed to the handler as they complete instead of being collected,
+    and the repetition itself returns nothing (see pegasus.events).
+    """
+    def __init__(self, *rules, **options):
+        self.events = options.pop('events', None)
+        if len(options):
+            raise BadRuleException('unknown Plus() options: {}'.format(', '.join(sorted(options))))
+
+        self.nodes = (_build_rule(rules),)
+
+    def __call__(self, char, parser):
+        rule = self.nodes[0]
         results = []
+        count = 0
+
+        handler = None
+        if self.events is not None:
+            context = _context(char)
+            handler = context.handler if context is not None else None
 
         try:
             while True:
@@ -329,31 +948,77 @@ def Plus(*rules):
                 while True:
                     result, reconsume = next(grule)
                     if result is not None:
-                        results.append(result)
+                        if handler is None:
+                            results.append(result)
+                        else:
+                            self._item(handler, count, result)
+                        count += 1
                         break
 
                     yield None, reconsume
 
                 yield None, reconsume
         except ParseError as e:
-            if len(results) == 0:
+            if count == 0:
                 raise e  # don't pass the stack; make sure we see that it's from here.
 
+            if handler is not None:
+                handler.end(self.events, count)
             yield tuple(results), True
 
-    return _iter
+    def _item(self, handler, count, result):
+        if count == 0:
+            handler.start(self.events)
+        handler.item(self.events, *result)
+
+    def prepare(self):
+        if _is_char(self.nodes[0]):
+            self.scanner = _scanner(self)
 
+    def match(self, context, pos):
+        if self.scanner is not None and context.scan:
+            scanned = self.scanner(context.text, pos)
+            if scanned is not None:
+                _ended(self, context, pos, scanned.end())
+                # each iteration's result is just the one character
+                return scanned.end(), tuple(zip(scanned.group()))
 
-def Star(*rules):
-    return Opt(Plus(*rules))
+        rule = self.nodes[0]
+        results = []
+        count = 0
+        handler = context.handler if self.events is not None else None
 
+        while True:
+            matched = rule.match(context, pos)
+            if matched is None:
+                break
+
+            if handler is None:
+                results.append(matched[1])
+            else:
+                self._item(handler, count, matched[1])
+            count += 1
+            if matched[0] == pos:
+                break  # it'd match nothing forever
+            pos = matched[0]
 
-def Discard(*rules):
-    rule = _build_rule(rules)
+        if count == 0:
+            return None
+        if handler is not None:
+            handler.end(self.events, count)
+        return pos, tuple(results)
 
-    @debuggable('Discard')
-    def _iter(char, parser):
-        grule = rule(char, parser)
+
+def Star(*rules, **options):
+    return Opt(Plus(*rules, **options))
+
+
+class Discard(Rule):
+    def __init__(self, *rules):
+        self.nodes = (_build_rule(rules),)
+
+    def __call__(self, char, parser):
+        grule = self.nodes[0](char, parser)
 
         while True:
             result, reconsume = next(grule)
@@ -362,40 +1027,391 @@ def Discard(*rules):
                 break
             yield None, reconsume
 
-    return _iter
+    def prepare(self):
+        self.scanner = _scanner(self.nodes[0])
+
+    def match(self, context, pos):
+        if self.scanner is not None and context.scan:
+            scanned = self.scanner(context.text, pos)
+            if scanned is not None:
+                _ended(self.nodes[0], context, pos, scanned.end())
+                return scanned.end(), ()
+
+        matched = self.nodes[0].match(context, pos)
+        return (matched[0], ()) if matched is not None else None
+
+
+class Span(object):
+    """The span of input matched by a Capture() rule
+
+    `start` and `end` are positions into the input. The matched string itself is
+    only sliced out of the input once it's asked for, through `value`.
 
+    When streaming, the input isn't kept around, so the span holds onto a copy of
+    the characters it consumed instead.
+    """
+    __slots__ = ('start', 'end', '_text', '_base')
 
-def Str(*rules):
-    rule = _build_rule(rules)
+    def __init__(self, text, start, end, base=0):
+        self.start = start
+        self.end = end
+        self._text = text
+        self._base = base
 
-    @debuggable('Str')
-    def _iter(char, parser):
-        grule = rule(char, parser)
+    @property
+    def value(self):
+        return self._text[self.start - self._base:self.end - self._base]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __eq__(self, other):
+        if isinstance(other, Span):
+            return (self.start, self.end, self.value) == (other.start, other.end, other.value)
+        return self.value == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return 'Span({}, {})'.format(self.start, self.end)
+
+    def __str__(self):
+        return str(self.value)
+
+    def __unicode__(self):
+        return unicode(self.value)
+
+
+class Str(Rule):
+    """Matches its rules, returning their results joined into one string
+
+    With `span`, the result is the Span of input the rules matched instead (see
+    Capture()).
+    """
+    pure = False
+
+    def __init__(self, *rules, **options):
+        self.span = options.pop('span', False)
+        if len(options):
+            raise BadRuleException('unknown Str() options: {}'.format(', '.join(sorted(options))))
+
+        self.nodes = (_build_rule(rules),)
+
+    def prepare(self):
+        self.pure = _is_pure(self.nodes[0])
+        self.scanner = _scanner(self.nodes[0])
+
+    def __call__(self, char, parser):
+        context = _context(char)
+        start = context.pos if context is not None else 0
+
+        # a span covers all of the input consumed, including what the rules discard
+        consumed = [] if self.span and context is not None else None
+
+        grule = self.nodes[0](char, parser)
         while True:
             result, reconsume = next(grule)
+            if consumed is not None and not reconsume and context.c is not None:
+                consumed.append(context.c)
             if result is not None:
-                result = (''.join(flatten(result)),)
-                yield result, reconsume
+                if consumed is not None:
+                    end = context.pos if reconsume else context.pos + 1
+                    result = Span(''.join(consumed), start, end, start)
+                else:
+                    result = _join(result)
+                    if self.span:
+                        result = Span(result, start, start + len(result), start)
+                yield (result,), reconsume
                 break
             yield None, reconsume
 
-    return _iter
+    def match(self, context, pos):
+        if self.scanner is not None and context.scan:
+            scanned = self.scanner(context.text, pos)
+            if scanned is not None:
+                _ended(self.nodes[0], context, pos, scanned.end())
+                if self.span:
+                    return scanned.end(), (Span(context.text, pos, scanned.end()),)
+                return scanned.end(), (scanned.group(),)
+
+        matched = self.nodes[0].match(context, pos)
+        if matched is None:
+            return None
+
+        if self.span:
+            return matched[0], (Span(context.text, pos, matched[0]),)
+
+        if self.pure:
+            # the result is made up of exactly the characters that were matched
+            return matched[0], (context.text[pos:matched[0]],)
+        return matched[0], (_join(matched[1]),)
+
+
+def _join(results):
+    """Joins (nested) results into one string, taking Spans for the input they cover"""
+    return ''.join(result.value if isinstance(result, Span) else result for result in flatten(results))
+
+
+def Capture(*rules):
+    """Matches the rules, returning the Span of input they matched"""
+    return Str(*rules, span=True)
+
+
+def _is_pure(rule):
+    """Whether or not a rule's flattened result is exactly the input it matched"""
+    if isinstance(rule, (Literal, In, _ChrRange, Cut)) or rule is Dot or rule is EOF:
+        return True
+    if isinstance(rule, (Seq, Or, Opt, Plus, Str)):
+        return all(_is_pure(node) for node in rule.nodes)
+    return False
+
+
+_MAX_FIRST = 4096
+
+# character ranges up to this wide are spelled out in character classes
+_MAX_CLASS = 1024
+
+
+class _CharClass(object):
+    """A compiled character class: a frozenset of characters, along with the ranges
+    too wide to spell out (checked one by one)"""
+    def __init__(self, chars, ranges=()):
+        chars = set(chars)
+        wide = []
+        for begin, end in ranges:
+            if ord(end) - ord(begin) < _MAX_CLASS:
+                chars.update(unichr(c) for c in xrange(ord(begin), ord(end) + 1))
+            elif begin <= end:
+                wide.append((begin, end))
+
+        self.chars = frozenset(chars)
+        self.ranges = tuple(sorted(wide))
+        self._bounds = tuple((ord(begin), ord(end)) for begin, end in self.ranges)
+
+    def __contains__(self, c):
+        if c in self.chars:
+            return True
+        if self._bounds:
+            # by value, so that bytes never get compared with characters
+            c = ord(c)
+            for begin, end in self._bounds:
+                if begin <= c <= end:
+                    return True
+        return False
+
+    def latin1(self):
+        """The class of the bytes of the same values as the class' characters"""
+        chars = [_latin1(c) for c in self.chars]
+        for begin, end in self.ranges:
+            chars += [chr(c) for c in xrange(ord(begin), min(ord(end), 0xff) + 1)]
+        return _CharClass([c for c in chars if c is not None])
+
+
+def _members(rule):
+    """The `(chars, ranges)` a rule made up of single character classes matches, or None"""
+    if isinstance(rule, In) and not rule.inverse and _is_char(rule):
+        return rule.members, ()
+    if isinstance(rule, _ChrRange) and not rule.inverse:
+        return (), ((rule.begin, rule.end),)
+    if isinstance(rule, Or):
+        chars, ranges = set(), []
+        for node in rule.nodes:
+            members = _members(node)
+            if members is None:
+                return None
+            chars.update(members[0])
+            ranges += members[1]
+        return chars, ranges
+    return None
+
+
+def _first(rule, visiting=()):
+    """Computes the FIRST set of a rule: the characters it can start with
+
+    Returns a `(chars, nullable)` tuple, where `chars` is a frozenset of characters
+    (or None if the rule could start with just about anything) and `nullable` is
+    whether or not the rule can match without consuming anything at all.
+    """
+    if rule.first is not None:
+        return rule.first
+    if rule in visiting:
+        return None, True
+
+    visiting += (rule,)
+    first = None, True
+
+    if isinstance(rule, Literal):
+        first = (frozenset(rule.utf[0]), False) if len(rule.utf) else (frozenset(), True)
+    elif isinstance(rule, In):
+        if not rule.inverse and _is_char(rule):
+            first = frozenset(rule.chars), False
+    elif isinstance(rule, _ChrRange):
+        if not rule.inverse and len(rule.rng) <= _MAX_FIRST:
+            first = frozenset(unichr(c) for c in rule.rng), False
+    elif rule is Dot:
+        first = None, False
+    elif rule is EOF or isinstance(rule, Cut):
+        first = frozenset(), True
+    elif isinstance(rule, (Seq, Or)):
+        chars = set()
+        nullable = isinstance(rule, Seq)
+        for node in rule.nodes:
+            node_chars, node_nullable = _first(node, visiting)
+            if chars is not None:
+                chars = chars.union(node_chars) if node_chars is not None else None
+            if isinstance(rule, Seq):
+                nullable = node_nullable
+                if not nullable:
+                    break
+            else:
+                nullable = nullable or node_nullable
+        first = (frozenset(chars) if chars is not None else None), nullable
+    elif isinstance(rule, Opt):
+        first = _first(rule.nodes[0], visiting)[0], True
+    elif isinstance(rule, (Plus, Discard, Str, ParserRule, All)):
+        first = _first(rule.nodes[0], visiting)
+
+    rule.first = first
+    return first
+
+
+def _is_char(rule):
+    """Whether or not a rule always matches exactly one character"""
+    if isinstance(rule, In):
+        return all(len(c) == 1 for c in rule.chars)
+    if isinstance(rule, Or):
+        return all(_is_char(node) for node in rule.nodes)
+    return isinstance(rule, _ChrRange) or rule is Dot
+
+
+def _regex(rule, tail, groups):
+    """Translates a tree of terminals into a regular expression, or returns None
+
+    PEG repetitions, options and choices never give anything back once they've
+    matched, so those are wrapped in atomic groups - emulated with a lookahead and
+    a backreference - unless nothing follows them (`tail`), in which case the
+    regex engine has no reason to backtrack into them anyway.
+    """
+    def atomic(pattern):
+        groups.append(None)
+        return u'(?=(?P<g{0}>{1}))(?P=g{0})'.format(len(groups), pattern)
+
+    if isinstance(rule, Literal):
+        return re.escape(rule.utf)
+    if isinstance(rule, In):
+        if not _is_char(rule):
+            return None
+        return u'[{}{}]'.format('^' if rule.inverse else '', u''.join(re.escape(c) for c in rule.chars))
+    if isinstance(rule, _ChrRange):
+        return u'[{}{}-{}]'.format('^' if rule.inverse else '', re.escape(rule.begin), re.escape(rule.end))
+    if rule is Dot:
+        return '.'
+    if rule is EOF:
+        return r'\Z'
+
+    if isinstance(rule, Str):
+        return _regex(rule.nodes[0], tail, groups)
+
+    if isinstance(rule, Seq):
+        last = len(rule.nodes) - 1
+        patterns = [_regex(node, tail and i == last, groups) for i, node in enumerate(rule.nodes)]
+        return None if None in patterns else u''.join(patterns)
+
+    if isinstance(rule, Plus) and rule.events is not None:
+        # the items have to go through the handler
+        return None
+    if isinstance(rule, (Or, Opt, Plus)):
+        if _is_char(rule):
+            return u'(?:{})'.format(u'|'.join(_regex(node, True, groups) for node in rule.nodes))
+
+        patterns = [_regex(node, True, groups) for node in rule.nodes]
+        if None in patterns:
+            return None
+
+        if isinstance(rule, Or):
+            pattern = u'(?:{})'.format(u'|'.join(patterns))
+        elif isinstance(rule, Opt):
+            pattern = u'(?:{})?'.format(patterns[0])
+        elif _is_char(rule.nodes[0]):
+            pattern = u'{}+'.format(patterns[0])
+        else:
+            pattern = u'(?:{})+'.format(atomic(patterns[0]))
 
+        return pattern if tail else atomic(pattern)
 
-@debuggable('Dot')
-def Dot(char, parser):
-    if char() is None:
-        raise ParseError(got='<EOF>', expected=['any non-EOF character'])
-    yield (char(),), False
+    return None
 
 
-def All(rule, *conditionals):
-    if len(conditionals) == 0:
-        raise BadRuleException('must supply at least one conditional')
+def _scanner(rule):
+    """Compiles a tree of terminals into a single regex, returning its match() method"""
+    pattern = _regex(rule, True, [])
+    if pattern is None:
+        return None
 
-    def _iter(char, parser):
-        gconds = [_build_rule(cond)(char, parser) for cond in conditionals]
-        grule = _build_rule(rule)(char, parser)
+    try:
+        return re.compile(pattern, re.DOTALL).match
+    except (re.error, AssertionError):
+        # e.g. too many groups; just match it rule by rule.
+        return None
+
+
+def _ended(rule, context, pos, end):
+    """Records the failures that ended a scanned match of a rule from `pos` to `end`
+
+    A regex match doesn't tell what stopped it, like the iteration of a repetition
+    that didn't match at `end`; rerunning just that part rule by rule records it,
+    like matching all of it rule by rule would have.
+
+    Where the parts of a Seq() or Or() ended isn't known, so those are rerun whole;
+    that costs as much as not scanning them at all, so it's put off until the parse
+    fails (see ParseContext.error()), and skipped if it doesn't.
+    """
+    if isinstance(rule, Plus):
+        rule.nodes[0].match(context, end)
+    elif isinstance(rule, Opt):
+        if end == pos:
+            rule.nodes[0].match(context, pos)
+        else:
+            _ended(rule.nodes[0], context, pos, end)
+    elif isinstance(rule, Str):
+        _ended(rule.nodes[0], context, pos, end)
+    elif isinstance(rule, (Seq, Or)):
+        context.ended.append((rule, pos))
+
+
+class __Dot(Rule):
+    def __repr__(self):
+        return 'Dot'
+
+    def __call__(self, char, parser):
+        if char() is None:
+            raise _failed(char, 'any non-EOF character')
+        yield (char(),), False
+
+    def match(self, context, pos):
+        if pos < context.length:
+            return pos + 1, (context.text[pos],)
+
+        context.fail(pos, 'any non-EOF character')
+        return None
+
+Dot = __Dot()
+
+
+class All(Rule):
+    def __init__(self, rule, *conditionals):
+        if len(conditionals) == 0:
+            raise BadRuleException('must supply at least one conditional')
+
+        self.nodes = (_build_rule(rule),) + tuple(_build_rule(cond) for cond in conditionals)
+
+    def __call__(self, char, parser):
+        gconds = [cond(char, parser) for cond in self.nodes[1:]]
+        grule = self.nodes[0](char, parser)
 
         while True:
             for gcond in gconds:
@@ -403,7 +1419,7 @@ def All(rule, *conditionals):
                 while reconsume:
                     result, reconsume = next(gcond)
                     if result is not None:
-                        raise ParseError(got='conditional result: {}'.format(result), expected=['never returning conditional rule'])
+                        raise _failed(char, 'never returning conditional rule')
 
             reconsume = True
             while reconsume:
@@ -414,16 +1430,37 @@ def All(rule, *conditionals):
 
             yield None, False
 
-    return _iter
 
+class In(Rule):
+    def __init__(self, chars, inverse=False):
+        if not chars:
+            raise BadRuleException('must supply a string/iterable with at least one character')
+
+        self.chars = chars
+        self.inverse = inverse
+
+        raw = [c for c in (_latin1(c) for c in chars) if c is not None]
+        self.raw = b''.join(raw) if isinstance(chars, basestring) else raw
+        self.expected = '{}one of: {}'.format('not ' if inverse else '', repr(''.join(chars)))
+
+        # a single character only ever matches the single character ones
+        self.members = frozenset(c for c in chars if len(c) == 1)
+        self.rmembers = frozenset(c for c in raw if len(c) == 1)
+
+    def __repr__(self):
+        return 'In({!r}{})'.format(self.chars, ', True' if self.inverse else '')
 
-def In(chars, inverse=False):
-    if not chars:
-        raise BadRuleException('must supply a string/iterable with at least one character')
+    def __call__(self, char, parser):
+        c = char()
+        if c is not None and (c in (self.rmembers if _binary(char) else self.members)) is not self.inverse:
+            yield (c,), False
+        raise _failed(char, self.expected)
 
-    def _iter(char, parser):
-        if char() is not None and (char() in chars) is not inverse:
-            yield (char(),), False
-        raise ParseError(got=char(), expected=['{}one of: {}'.format('not ' if inverse else '', repr(''.join(chars)))])
+    def match(self, context, pos):
+        if pos < context.length:
+            c = context.text[pos]
+            if (c in (self.rmembers if context.binary else self.members)) is not self.inverse:
+                return pos + 1, (c,)
 
-    return _iter
+        context.fail(pos, self.expected)
+        return None
@@ -0,0 +1,194 @@
+"""Parse tracing
+
+A Tracer is told about every rule a parse runs: when it's entered, whether it
+produced a result or failed, and when it's exited. Tracers can be attached to a
+single parse (`parser.parse(rule, text, tracer=...)`) or to a parser instance
+(`parser.tracer = ...`) at any time:
+
+    class SlowRules(Tracer):
+        def enter(self, rule, pos):
+            ...
+
+    parser.parse(JsonParser.document, text, tracer=SlowRules())
+
+Traced parses run on a copy of the rule graph made up of tracing nodes (see
+traced()), built the first time a rule is traced; parses without a tracer run on
+the original graph as always, so tracing costs them nothing.
+"""
+from __future__ import unicode_literals
+
+import copy
+import sys
+from pegasus.rules import _context, Or, ParseError, Rule, _COMPILING
+
+
+class Tracer(object):
+    """Base class for tracers; the hooks do nothing unless overridden
+
+    `rule` is the rule node being run (its repr() is the rule's name, or a
+    description of it) and `pos` is the position in the input it started at.
+    """
+    def enter(self, rule, pos):
+        """Called when a rule starts matching"""
+        pass
+
+    def result(self, rule, pos, end, result):
+        """Called when a rule matches everything up to `end`, producing `result`"""
+        pass
+
+    def fail(self, rule, pos):
+        """Called when a rule fails to match"""
+        pass
+
+    def exit(self, rule, pos):
+        """Called when a rule is done, whether it matched or not"""
+        pass
+
+    def graph(self, root):
+        """Returns the copy of a compiled rule graph that parses with this tracer run on
+
+        That's the tracing copy (see traced()), which calls the hooks above.
+        """
+        return traced(root)
+
+
+class PrintTracer(Tracer):
+    """Prints an indented line for every hook to `stream` (stdout by default)"""
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.depth = 0
+
+    def write(self, event, rule, pos, extra=''):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write('pegasus: {}{} {!r} @ {}{}\n'.format('  ' * self.depth, event, rule, pos, extra))
+
+    def enter(self, rule, pos):
+        self.write('enter', rule, pos)
+        self.depth += 1
+
+    def result(self, rule, pos, end, result):
+        self.write('result', rule, pos, '-{} ==> {!r}'.format(end, result))
+
+    def fail(self, rule, pos):
+        self.write('fail', rule, pos)
+
+    def exit(self, rule, pos):
+        self.depth -= 1
+        self.write('exit', rule, pos)
+
+
+def traced(root):
+    """Returns the tracing copy of a compiled rule graph (building it only once)"""
+    tracing = root.__dict__.get('_traced')
+    if tracing is not None:
+        return tracing
+
+    with _COMPILING:
+        # someone else might have just built it
+        tracing = root.__dict__.get('_traced')
+        if tracing is None:
+            tracing = root._traced = _copy(root, _tracing)
+        return tracing
+
+
+def _copy(root, wrap):
+    """Copies a compiled rule graph, giving every copy the class `wrap(type(node))`
+
+    The original graph is left alone; every copy refers to the node it was copied
+    from as `_original`. Returns the copy of `root`.
+    """
+    copies = {}
+    pending = [root]
+    while len(pending):
+        node = pending.pop()
+        if node in copies:
+            continue
+
+        clone = copy.copy(node)
+        clone.__class__ = wrap(type(node))
+        clone.__dict__.pop('_traced', None)
+        clone._original = node
+        copies[node] = clone
+        pending += node.nodes
+
+    def remap(entry):
+        return tuple(copies[node] for node in entry[0]), entry[1]
+
+    for node, clone in copies.items():
+        clone.nodes = tuple(copies[child] for child in node.nodes)
+        if isinstance(node, Or) and node.table is not None:
+            clone.table = dict((c, remap(entry)) for c, entry in node.table.items())
+            clone.btable = dict((c, remap(entry)) for c, entry in node.btable.items())
+            clone.default = remap(node.default)
+
+    return copies[root]
+
+
+_TRACING = {}
+
+
+def _tracing(cls):
+    """Returns the tracing subclass of a node class"""
+    tracing = _TRACING.get(cls)
+    if tracing is not None:
+        return tracing
+
+    def __call__(self, char, parser):
+        grule = cls.__call__(self, char, parser)
+        context = _context(char)
+        if context is None or context.tracer is None:
+            return grule
+        return _trace(self._original, context, grule)
+
+    def match(self, context, pos):
+        tracer = context.tracer
+        if tracer is None or drives:
+            # nodes matching by driving their own generator get traced by it
+            return cls.match(self, context, pos)
+
+        node = self._original
+        tracer.enter(node, pos)
+        try:
+            matched = cls.match(self, context, pos)
+            if matched is None:
+                tracer.fail(node, pos)
+            else:
+                tracer.result(node, pos, matched[0], matched[1])
+        finally:
+            tracer.exit(node, pos)
+        return matched
+
+    drives = cls.match.__func__ is Rule.match.__func__
+    tracing = _TRACING[cls] = type(cls.__name__, (cls,), {
+        '__module__': cls.__module__,
+        '__call__': __call__,
+        'match': match,
+    })
+    return tracing
+
+
+def _trace(node, context, grule):
+    tracer = context.tracer
+    pos = context.pos
+    tracer.enter(node, pos)
+
+    try:
+        while True:
+            try:
+                result, reconsume = next(grule)
+            except ParseError:
+                tracer.fail(node, pos)
+                tracer.exit(node, pos)
+                raise
+
+            if result is not None:
+                break
+            yield result, reconsume
+    except GeneratorExit:
+        # abandoned by whoever was running it
+        tracer.exit(node, pos)
+        raise
+
+    tracer.result(node, pos, context.pos if reconsume else context.pos + 1, result)
+    tracer.exit(node, pos)
+    yield result, reconsume
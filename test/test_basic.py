@@ -2,7 +2,7 @@
 from __future__ import unicode_literals
 
 from pegasus import Parser, rule
-from pegasus.rules import Plus, Opt, Discard, Star, ChrRange as C, EOF, Str
+from pegasus.rules import Plus, Opt, Discard, Star, ChrRange as C, EOF, Lazy, Str, compile_rule
 
 
 class SimpleParser(Parser):
@@ -27,3 +27,36 @@ def test_simple_parser():
     assert 'Paul' == parser.parse(SimpleParser.hello_world, 'greetings, Paul!')
     assert 'Sheila' == parser.parse(SimpleParser.hello_world, 'yo,   Sheila!')
     assert 'Josh' == parser.parse(SimpleParser.hello_world, 'salutations,     Josh')
+
+
+def test_rule_graph_is_built_once():
+    node = compile_rule(SimpleParser.hello_world)
+    assert node is compile_rule(SimpleParser.hello_world)
+    assert node.compiled
+
+    # nested @rule methods map to the very same node everywhere they're used
+    greeting = compile_rule(SimpleParser.greeting)
+    assert greeting in node.nodes[0].nodes[0].nodes[0].nodes
+
+
+def test_lazy_rules_resolve_per_class():
+    class UpperParser(Parser):
+        @rule(Lazy('letters'))
+        def word(self, word):
+            return word
+
+        @rule(Str(Plus(C['A':'Z'])))
+        def letters(self, letters):
+            return letters
+
+    class LowerParser(Parser):
+        @rule(Lazy('letters'))
+        def word(self, word):
+            return word
+
+        @rule(Str(Plus(C['a':'z'])))
+        def letters(self, letters):
+            return letters
+
+    assert UpperParser().parse(UpperParser.word, 'ABC') == 'ABC'
+    assert LowerParser().parse(LowerParser.word, 'abc') == 'abc'
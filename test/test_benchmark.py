@@ -0,0 +1,41 @@
+"""Benchmark harness smoke tests"""
+from __future__ import unicode_literals
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench'))
+import benchmark
+
+
+def test_benchmark_run():
+    results = benchmark.run(1, 1, isolate=False, select=['combinator/literal', 'records/pegasus-codegen'])
+    assert [(r['group'], r['case'], r['engine']) for r in results] == [
+        ('json', 'records', 'pegasus-codegen'),
+        ('combinator', 'literal', 'pegasus'),
+    ]
+    assert all(r['mb_per_s'] > 0 for r in results)
+
+    assert all(r['peak_rss'] >= 0 for r in results)
+
+    report = benchmark.report(results, 1)
+    slower = [dict(r, mb_per_s=r['mb_per_s'] / 2) for r in results]
+    assert benchmark.compare(slower, report, 0.1) == [
+        ('json/records/pegasus-codegen', 'mb_per_s', results[0]['mb_per_s'], results[0]['mb_per_s'] / 2),
+        ('combinator/literal/pegasus', 'mb_per_s', results[1]['mb_per_s'], results[1]['mb_per_s'] / 2),
+    ]
+    assert benchmark.compare(results, report, 0.1) == []
+
+    # memory counts as well, beyond the noise
+    bigger = [dict(results[0], peak_rss=results[0]['peak_rss'] * 2 + benchmark.RSS_NOISE + 1),
+              dict(results[1], peak_rss=results[1]['peak_rss'] + 10)]
+    assert benchmark.compare(bigger, report, 0.1) == [
+        ('json/records/pegasus-codegen', 'peak_rss', results[0]['peak_rss'], bigger[0]['peak_rss']),
+    ]
+
+
+def test_benchmark_isolated():
+    # the child builds the one case it runs, and measures memory from its own baseline
+    results = benchmark.run(1, 1, select=['records/pegasus-stream', 'records/json'])
+    assert [r['engine'] for r in results] == ['pegasus-stream', 'json']
+    assert all(r['mb_per_s'] > 0 and r['peak_rss'] >= 0 for r in results)
@@ -0,0 +1,83 @@
+"""Byte buffer input tests"""
+from __future__ import unicode_literals
+
+import json
+import pytest
+from pegasus import Parser, rule
+from pegasus.rules import *
+
+from test_json import JsonParser
+
+
+DOC = b'{"foo": [1, 2.5, {"bar": "baz\\\\n"}], "qux": true}'
+
+
+class ByteParser(Parser):
+    @rule(Str(Plus(ChrRange['\x80':'\xff'])))
+    def high(self, chars):
+        return chars
+
+    @rule(['\xe9t\xe9', 'ete'])
+    def word(self, word):
+        return word
+
+    @rule(Str(Plus(In('ab\xff'))), Opt(Dot))
+    def chars(self, chars, rest=None):
+        return chars, rest
+
+
+def test_bytes_json():
+    parser = JsonParser()
+    expected = json.loads(DOC)
+
+    for data in [bytearray(DOC), memoryview(DOC), buffer(DOC)]:
+        result = parser.parse(JsonParser.document, data)
+        assert result == expected
+        assert type(result['foo'][2]['bar']) is bytes
+
+    arrays = bytearray(b'[1][2.5][]')
+    assert list(parser.iterparse(JsonParser.array, arrays)) == [[1], [2.5], []]
+
+
+def test_bytes_values():
+    parser = ByteParser()
+    assert parser.parse(ByteParser.high, bytearray(b'\x80\xe9\xff')) == b'\x80\xe9\xff'
+    assert parser.parse(ByteParser.word, bytearray(b'\xe9t\xe9')) == b'\xe9t\xe9'
+    assert parser.parse(ByteParser.word, bytearray(b'ete')) == b'ete'
+    assert parser.parse(ByteParser.chars, bytearray(b'ab\xffa\x01')) == (b'ab\xffa', b'\x01')
+
+    with pytest.raises(ParseError) as e:
+        parser.parse(ByteParser.high, bytearray(b'\x80\x7f'))
+    assert e.value.position == 1
+    assert e.value.got == b'\x7f'
+
+
+def test_bytes_streamed_ranges():
+    # streamed byte strings compare with ranges by value
+    parser = ByteParser()
+    assert parser.parse(ByteParser.high, iter([b'\x80\xe9\xff'])) == b'\x80\xe9\xff'
+    with pytest.raises(ParseError) as e:
+        parser.parse(ByteParser.high, iter([b'\x80\x7f']))
+    assert e.value.position == 1
+
+
+def test_bytes_streamed():
+    parser = ByteParser()
+
+    def feed(rule, data):
+        session = parser.start(rule)
+        session.feed(bytearray(data))
+        return session.close()
+
+    def stream(rule, data):
+        return parser.parse(rule, iter(bytearray(data)))
+
+    for parse in [feed, stream]:
+        assert parse(ByteParser.high, b'\x80\xe9\xff') == b'\x80\xe9\xff'
+        assert parse(ByteParser.word, b'\xe9t\xe9') == b'\xe9t\xe9'
+        assert parse(ByteParser.word, b'ete') == b'ete'
+        assert parse(ByteParser.chars, b'ab\xffa\x01') == (b'ab\xffa', b'\x01')
+
+        with pytest.raises(ParseError) as e:
+            parse(ByteParser.high, b'\x80\x7f')
+        assert e.value.position == 1
@@ -0,0 +1,115 @@
+"""Static grammar check tests"""
+from __future__ import unicode_literals
+
+import pytest
+import warnings
+from pegasus import Parser, rule
+from pegasus.check import check_grammar, check_rule, main, GrammarWarning
+from pegasus.rules import BadRuleException, ChrRange as C, EOF, In, Lazy, Opt, Plus, Star, compile_rule
+
+from test_json import JsonParser
+
+
+class BadParser(Parser):
+    @rule([(Lazy('expr'), '+', Lazy('term')), Lazy('term')])
+    def expr(self, *_):
+        pass
+
+    @rule([(Lazy('term'), '*', 'x'), 'x'])
+    def term(self, *_):
+        pass
+
+    @rule(Star(Opt('a')), 'b')
+    def stall(self, *_):
+        pass
+
+    @rule(['as', 'assert', In('xyz'), 'yes', Opt('n'), 'never'])
+    def keyword(self, *_):
+        pass
+
+    @rule(keyword)
+    def unused(self, *_):
+        pass
+
+
+class NullableParser(Parser):
+    @rule([EOF, ('x', Lazy('items'))])
+    def items(self, *_):
+        pass
+
+    @rule([(Opt('-'), EOF), 'y', (Star('z'), Opt('w')), 'never'])
+    def options(self, *_):
+        pass
+
+
+def _issues(issues):
+    return sorted((issue.kind, issue.rule) for issue in issues)
+
+
+def test_check_grammar():
+    issues = check_grammar(BadParser, BadParser.expr, BadParser.stall)
+    assert _issues(issues) == [
+        ('left-recursion', 'expr'),
+        ('left-recursion', 'term'),
+        ('nullable-repetition', 'stall'),
+        ('shadowed', 'keyword'),
+        ('shadowed', 'keyword'),
+        ('shadowed', 'keyword'),
+        ('unreachable', 'keyword'),
+        ('unreachable', 'unused'),
+    ]
+
+    messages = [issue.message for issue in issues if issue.kind == 'shadowed']
+    assert "alternative u'assert' is never tried: u'as' matches a prefix of it" in messages
+    assert "alternative u'yes' is never tried: In(u'xyz') matches its first character" in messages
+    assert "alternative u'never' is never tried: Opt(u'n') always matches" in messages
+
+    left = [issue.message for issue in issues if issue.kind == 'left-recursion']
+    assert 'left recursive: expr -> expr' in left
+    assert 'left recursive: term -> term' in left
+
+
+def test_check_nullable_alternatives():
+    # alternatives that can match nothing only shadow the rest if they can't fail
+    issues = check_grammar(NullableParser, NullableParser.items, NullableParser.options)
+    assert [issue.message for issue in issues] == [
+        "alternative u'never' is never tried: Seq(Opt(Plus(u'z')), Opt(u'w')) always matches"]
+
+
+def test_check_clean_grammar():
+    assert check_grammar(JsonParser, JsonParser.document) == []
+    assert check_rule(JsonParser.document) == []
+
+
+def test_checked_on_compile():
+    class LeftParser(Parser):
+        @rule(Lazy('a'), 'x')
+        def a(self, *_):
+            pass
+
+        @rule(Plus(Star(C['0':'9'])))
+        def b(self, *_):
+            pass
+
+        @rule(['a', 'ab'])
+        def c(self, *_):
+            pass
+
+    with pytest.raises(BadRuleException) as e:
+        compile_rule(LeftParser.a)
+    assert 'a (left-recursion): left recursive: a -> a' in str(e.value)
+
+    with pytest.raises(BadRuleException):
+        LeftParser().parse(LeftParser.b, '123')
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        assert LeftParser().parse(LeftParser.c, 'a') is None
+    assert [w.category for w in caught] == [GrammarWarning]
+
+
+def test_check_main(capsys):
+    assert main(['test_json:JsonParser', 'document']) == 0
+    assert main(['test_check:BadParser']) == 1
+    out = capsys.readouterr()[0]
+    assert 'error: expr (left-recursion)' in out
@@ -0,0 +1,131 @@
+"""Generated parser tests"""
+from __future__ import unicode_literals
+
+import json
+import os
+import pytest
+import pegasus.codegen
+from pegasus import Parser, rule
+from pegasus.codegen import generate, compile_grammar, fingerprint
+from pegasus.rules import ChrRange as C, Lazy, ParseError, Plus, Str
+
+from test_basic import SimpleParser
+from test_json import JsonParser
+
+
+def test_codegen_source():
+    source = generate(JsonParser)
+    compile(source, '<generated>', 'exec')
+    assert 'def _r_value(parser, text, pos, st):' in source
+
+
+def test_codegen_simple_parser():
+    grammar = compile_grammar(SimpleParser)
+    assert grammar is compile_grammar(SimpleParser)
+
+    parser = SimpleParser()
+    assert 'Paul' == grammar.parse(parser, 'hello_world', 'hello, Paul!')
+    assert 'Sheila' == grammar.parse(parser, 'hello_world', 'yo,   Sheila!')
+    assert 'Josh' == grammar.parse(parser, 'hello_world', 'salutations,     Josh')
+
+
+def test_codegen_json():
+    grammar = compile_grammar(JsonParser)
+    parser = JsonParser()
+
+    for rule, text in [
+        ('number', '-1234.5678'),
+        ('number', '.1234'),
+        ('string', '"\\v\\t\\n"'),
+        ('value', 'null'),
+        ('array', '[1, 2, \n3, true, false]'),
+        ('array', '[[[],[]]]'),
+        ('object', '{"foo": true, "hello": 12345, "another": [1, 2, 3]}'),
+    ]:
+        expected = parser.parse(getattr(JsonParser, rule), text, match=False)
+        assert grammar.parse(parser, rule, text, match=False) == expected
+
+    doc = json.dumps({'a': [1, 2.5, {'b': 'hello \\n world', 'c': [True, False]}] * 5, 'd': 'x' * 50})
+    assert grammar.parse(parser, 'document', doc) == parser.parse(JsonParser.document, doc)
+
+
+def test_codegen_errors():
+    grammar = compile_grammar(JsonParser)
+    parser = JsonParser()
+
+    with pytest.raises(ParseError) as e:
+        grammar.parse(parser, 'document', '{"foo": [1, 2, }')
+    assert e.value.got == '}'
+
+    with pytest.raises(ParseError):
+        grammar.parse(parser, 'number', '1234 ')
+
+
+class CachedParser(Parser):
+    @rule(Str(Plus(C['a':'z'])), Lazy('digits'))
+    def word(self, word, digits):
+        return word + digits
+
+    @rule(Str(Plus(C['0':'9'])))
+    def digits(self, digits):
+        return digits
+
+
+def test_codegen_cache(tmpdir, monkeypatch):
+    cache = str(tmpdir.join('cache'))
+    grammar = compile_grammar(CachedParser, cache=cache)
+    assert grammar.parse(CachedParser(), 'word', 'abc123') == 'abc123'
+    assert os.listdir(cache) == ['test_codegen.CachedParser-{}.py'.format(fingerprint(CachedParser)[:16])]
+
+    # a fresh process would load the cached source instead of generating it
+    del CachedParser._generated
+    monkeypatch.setattr(pegasus.codegen, '_Generator', None)
+    grammar = compile_grammar(CachedParser, cache=cache)
+    assert grammar.parse(CachedParser(), 'word', 'xyz9') == 'xyz9'
+
+
+def test_codegen_local_class():
+    # classes defined in a function can't be imported by the generated module
+    class LocalParser(CachedParser):
+        @rule(Lazy('word'), ' ', Lazy('word'))
+        def words(self, first, _, second):
+            return [first, second]
+
+    grammar = compile_grammar(LocalParser)
+    assert grammar.parse(LocalParser(), 'words', 'abc1 de23') == ['abc1', 'de23']
+
+
+def test_codegen_fingerprint():
+    assert fingerprint(CachedParser) == fingerprint(CachedParser)
+    assert fingerprint(CachedParser) != fingerprint(SimpleParser)
+
+    class OtherParser(Parser):
+        @rule(Str(Plus(C['a':'z'])), Lazy('digits'))
+        def word(self, word, digits):
+            return word + digits
+
+        @rule(Str(Plus(C['0':'8'])))
+        def digits(self, digits):
+            return digits
+
+    OtherParser.__name__ = CachedParser.__name__
+    assert fingerprint(OtherParser) != fingerprint(CachedParser)
+
+
+def test_codegen_fingerprint_references():
+    def parsers(last):
+        class Digits(Parser):
+            @rule(Str(Plus(C['0':last])))
+            def digits(self, digits):
+                return digits
+
+        class Words(Parser):
+            @rule(Str(Plus(C['a':'z'])), Digits.digits)
+            def word(self, word, digits):
+                return word + digits
+
+        return Words
+
+    # the other class' rule gets generated into this one's parser as well
+    assert fingerprint(parsers('9')) == fingerprint(parsers('9'))
+    assert fingerprint(parsers('9')) != fingerprint(parsers('8'))
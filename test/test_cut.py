@@ -0,0 +1,77 @@
+"""Cut() tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus import Parser, rule
+from pegasus.codegen import compile_grammar
+from pegasus.rules import ChrRange as C, Cut, Discard, Plus, Str, ParseError
+
+
+class CutParser(Parser):
+    @rule(Str(Plus(C['a':'z'])))
+    def word(self, word):
+        return word
+
+    @rule('if', Cut(), Discard(' '), word)
+    def conditional(self, _, condition):
+        return 'if', condition
+
+    @rule([conditional, word])
+    def statement(self, statement):
+        return statement
+
+    @rule([('let', Discard(' '), word), word])
+    def uncut(self, *parts):
+        return parts
+
+    @rule([('a', Cut(), 'b'), ('a', 'c')])
+    def failed_cut(self, *parts):
+        return parts
+
+    @rule([('a', 'b', 'c'), ('a', Cut(), 'x')])
+    def later_cut(self, *parts):
+        return parts
+
+
+def test_cut():
+    parser = CutParser()
+    for packrat in (False, True):
+        assert parser.parse(CutParser.statement, 'if x', packrat=packrat) == ('if', 'x')
+        assert parser.parse(CutParser.statement, 'fix', packrat=packrat) == 'fix'
+
+        # 'ifx' is a word, but the cut commits to the conditional
+        with pytest.raises(ParseError) as e:
+            parser.parse(CutParser.statement, 'ifx', packrat=packrat)
+        assert e.value.position == 2
+
+        assert parser.parse(CutParser.uncut, 'letx', packrat=packrat) == ('letx',)
+
+
+def test_cut_streaming():
+    parser = CutParser()
+    assert parser.parse(CutParser.statement, iter('if x')) == ('if', 'x')
+    assert parser.parse(CutParser.statement, iter('fix')) == 'fix'
+    with pytest.raises(ParseError):
+        parser.parse(CutParser.statement, iter('ifx'))
+
+
+def test_cut_same_step():
+    parser = CutParser()
+    for text in ('ac', iter('ac')):
+        # failing right past the cut still commits
+        with pytest.raises(ParseError):
+            parser.parse(CutParser.failed_cut, text)
+
+    for text in ('abc', iter('abc')):
+        # a cut only drops the alternatives after it
+        assert parser.parse(CutParser.later_cut, text) == ('a', 'b', 'c')
+
+
+def test_cut_codegen():
+    grammar = compile_grammar(CutParser)
+    parser = CutParser()
+    assert grammar.parse(parser, 'statement', 'if x') == ('if', 'x')
+    assert grammar.parse(parser, 'statement', 'fix') == 'fix'
+    with pytest.raises(ParseError):
+        grammar.parse(parser, 'statement', 'ifx')
+    assert grammar.parse(parser, 'uncut', 'letx') == ('letx',)
@@ -0,0 +1,47 @@
+"""Parse error reporting tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus.rules import ParseError
+
+from test_json import JsonParser
+
+
+def test_parse_error_message():
+    error = ParseError(got='x', expected=['a', 'b'], position=3)
+    assert str(error) == "at position 3: got: u'x', expected one of:\n- a\n- b"
+    assert str(ParseError(got='x', expected=['a'])) == "got: u'x', expected: a"
+    assert str(ParseError()) == 'unknown parse error'
+
+    combined = ParseError.combine([ParseError(got='x', expected=['a']), ParseError(got='y', expected=['b'])])
+    assert combined.expected == ["a but got 'x' instead", "b but got 'y' instead"]
+
+
+def test_furthest_failure():
+    parser = JsonParser()
+
+    with pytest.raises(ParseError) as e:
+        parser.parse(JsonParser.document, '{"foo": [1, 2, }', engine='indexed')
+
+    assert e.value.position == 15
+    assert e.value.got == '}'
+    assert 'array' in e.value.expected
+    assert "u'['" not in e.value.expected
+
+    with pytest.raises(ParseError) as e:
+        parser.parse(JsonParser.document, iter('[1, 2, }'))
+
+    assert e.value.position == 7
+    assert e.value.got == '}'
+    assert 'array' in e.value.expected
+
+
+def test_failure_at_eof():
+    parser = JsonParser()
+
+    for text in ['[1, 2', iter('[1, 2')]:
+        with pytest.raises(ParseError) as e:
+            parser.parse(JsonParser.document, text)
+
+        assert e.value.position == 5
+        assert e.value.got == '<EOF>'
@@ -0,0 +1,67 @@
+"""Event mode tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus import Parser, rule
+from pegasus.codegen import compile_grammar
+from pegasus.events import EventHandler
+from pegasus.rules import BadRuleException, ChrRange as C, Discard, Opt, Plus, Star, Str
+
+
+class Recorder(EventHandler):
+    def __init__(self):
+        self.events = []
+
+    def start(self, name):
+        self.events.append(('start', name))
+
+    def item(self, name, *results):
+        self.events.append(('item', name) + results)
+
+    def end(self, name, count):
+        self.events.append(('end', name, count))
+
+
+class ListParser(Parser):
+    @rule(Str(Plus(C['0':'9'])))
+    def number(self, number):
+        return int(number)
+
+    @rule(Discard('['), Star(number, Discard(Opt(',')), events='numbers'), Discard(']'))
+    def numbers(self, *numbers):
+        return [number for number, in numbers]
+
+
+def test_events():
+    parser = ListParser()
+    expected = [('start', 'numbers'), ('item', 'numbers', 1), ('item', 'numbers', 22), ('item', 'numbers', 333),
+                ('end', 'numbers', 3)]
+
+    for text in ('[1,22,333]', iter('[1,22,333]')):
+        recorder = Recorder()
+        assert parser.parse(ListParser.numbers, text, handler=recorder) == []
+        assert recorder.events == expected
+
+        recorder = Recorder()
+        assert parser.parse(ListParser.numbers, '[]', handler=recorder) == []
+        assert recorder.events == []
+
+    # without a handler, the items are collected as usual
+    assert parser.parse(ListParser.numbers, '[1,22,333]') == [1, 22, 333]
+    assert parser.parse(ListParser.numbers, iter('[1,22,333]')) == [1, 22, 333]
+    assert compile_grammar(ListParser).parse(parser, 'numbers', '[1,22,333]') == [1, 22, 333]
+
+
+def test_events_session():
+    recorder = Recorder()
+    session = ListParser().start(ListParser.numbers, handler=recorder)
+    session.feed('[1,2')
+    assert recorder.events == [('start', 'numbers'), ('item', 'numbers', 1)]
+    session.feed('2]')
+    assert session.close() == []
+    assert recorder.events[-1] == ('end', 'numbers', 2)
+
+
+def test_events_options():
+    with pytest.raises(BadRuleException):
+        Plus('a', event='a')
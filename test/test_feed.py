@@ -0,0 +1,82 @@
+"""Incremental (push) parsing tests"""
+from __future__ import unicode_literals
+
+import json
+import pytest
+from pegasus.rules import ParseError
+
+from test_json import JsonParser
+
+
+DOC = '{"foo": [1, 2, {"bar": "baz"}], "quux": true}'
+
+
+def test_feed_chunks():
+    parser = JsonParser()
+
+    for size in [1, 7, len(DOC)]:
+        session = parser.start(JsonParser.document)
+        for i in range(0, len(DOC), size):
+            assert session.feed(DOC[i:i + size]) is None
+            assert not session.done
+
+        assert session.close() == json.loads(DOC)
+        assert session.done
+
+
+def test_feed_completes_rule():
+    parser = JsonParser()
+    session = parser.start(JsonParser.array)
+    assert session.feed('[1, ') is None
+    assert session.feed('2]') == [1, 2]
+    assert session.done
+    assert session.close() == [1, 2]
+
+
+def test_feed_rest():
+    parser = JsonParser()
+    session = parser.start(JsonParser.number, match=False)
+    session.feed('12')
+    assert not session.done
+    assert session.feed('.5 [1]') == 12.5
+    assert session.done
+    assert session.feed('!') == 12.5
+    assert ''.join(session.rest) == ' [1]!'
+
+
+def test_feed_errors():
+    parser = JsonParser()
+    session = parser.start(JsonParser.document)
+    session.feed('[1, ')
+
+    with pytest.raises(ParseError) as e:
+        session.feed('2 3]')
+    assert e.value.position == 6
+    assert e.value.got == '3'
+
+    # the session stays failed
+    with pytest.raises(ParseError):
+        session.close()
+
+    session = parser.start(JsonParser.array)
+    session.feed('[1]')
+    with pytest.raises(ParseError) as e:
+        session.feed('?')
+    assert e.value.got == '?'
+    assert '<EOF>' in e.value.expected
+
+
+def test_feed_bytes():
+    parser = JsonParser()
+    data = DOC.encode('utf-8')
+
+    session = parser.start(JsonParser.document)
+    session.feed(bytearray(data[:10]))
+    session.feed(memoryview(data[10:20]))
+    session.feed(buffer(data[20:]))
+    assert session.close() == json.loads(DOC)
+
+    assert parser.start(JsonParser.array).feed(bytearray(b'[1]')) == [1]
+
+    # iterating a bytearray gives the bytes' values
+    assert parser.parse(JsonParser.document, iter(bytearray(data))) == json.loads(DOC)
@@ -0,0 +1,26 @@
+"""Memory-mapped file parsing tests"""
+from __future__ import unicode_literals
+
+import json
+import pytest
+from pegasus.rules import ParseError
+
+from test_json import JsonParser
+
+
+def test_parse_file(tmpdir):
+    doc = {'foo': [1, 2.5, {'bar': 'baz'}], 'qux': False}
+    path = tmpdir.join('doc.json')
+    path.write(json.dumps(doc, indent=2))
+
+    parser = JsonParser()
+    assert parser.parse_file(JsonParser.document, str(path)) == doc
+
+    path.write('')
+    assert parser.parse_file(JsonParser.document, str(path)) is None
+
+    path.write('[1, 2, ]')
+    with pytest.raises(ParseError) as e:
+        parser.parse_file(JsonParser.document, str(path), engine='indexed')
+    assert e.value.position == 7
+    assert e.value.got == ']'
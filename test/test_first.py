@@ -0,0 +1,82 @@
+"""FIRST set and Or() dispatch tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus import Parser, rule
+from pegasus.rules import ChrRange as C, In, Or, ParseError, Plus, Str, compile_rule, _first
+
+from test_json import JsonParser
+
+
+def test_first_sets():
+    assert _first(compile_rule(JsonParser.null_literal)) == (frozenset('n'), False)
+    assert _first(compile_rule(JsonParser.bool_literal)) == (frozenset('tf'), False)
+    assert _first(compile_rule(JsonParser.ws)) == (frozenset(' \t\r\n\f'), True)
+    assert _first(compile_rule(JsonParser.number)) == (frozenset('+-.0123456789'), False)
+    assert _first(compile_rule(JsonParser.value))[0] == frozenset('"+-.0123456789tfn[{')
+
+
+def test_or_dispatch():
+    value = compile_rule(JsonParser.value).nodes[0]
+    assert value.table is not None
+
+    candidates, skipped = value.table['[']
+    assert [repr(candidate) for candidate in candidates] == ['array']
+    assert 'string' in skipped and 'object' in skipped
+
+    candidates, skipped = value.default
+    assert len(candidates) == 0
+
+
+def test_or_dispatch_errors():
+    parser = JsonParser()
+    for text in ['}', iter('}')]:
+        with pytest.raises(ParseError) as e:
+            parser.parse(JsonParser.value, text)
+        assert 'array' in str(e.value)
+
+
+class CharClassParser(Parser):
+    @rule(Str(Plus([C['0':'9'], C['A':'F'], C['a':'f']])))
+    def hex_number(self, number):
+        return number
+
+    @rule(Str(Plus([In('_$'), [C['a':'z'], C['A':'Z']], C['\u0100':'\uffff']])))
+    def identifier(self, identifier):
+        return identifier
+
+    @rule(Str(Plus([C['\u0100':'\u1fff'], [C['\u3000':'\u4000'], C['\u4e00':'\u9fff']]])))
+    def wide(self, wide):
+        return wide
+
+
+def test_char_classes():
+    hex_char = compile_rule(CharClassParser.hex_number).nodes[0].nodes[0].nodes[0]
+    assert isinstance(hex_char, Or) and hex_char.charclass.chars == frozenset('0123456789ABCDEFabcdef')
+
+    parser = CharClassParser()
+    for text in ('00ff', iter('00ff'), bytearray(b'00ff')):
+        assert parser.parse(CharClassParser.hex_number, text) == (b'00ff' if isinstance(text, bytearray) else '00ff')
+    with pytest.raises(ParseError) as e:
+        parser.parse(CharClassParser.hex_number, 'g')
+    assert len(e.value.expected) == 3
+
+    # wide ranges are checked as such
+    identifier = compile_rule(CharClassParser.identifier).nodes[0].nodes[0].nodes[0]
+    assert identifier.charclass.ranges == (('\u0100', '\uffff'),)
+    for text in ('_a$Z\u4e2d', iter('_a$Z\u4e2d')):
+        assert parser.parse(CharClassParser.identifier, text) == '_a$Z\u4e2d'
+    with pytest.raises(ParseError):
+        parser.parse(CharClassParser.identifier, '_\u00e9')
+    with pytest.raises(ParseError):
+        parser.parse(CharClassParser.identifier, iter([b'_\xe9']))
+
+    # as are Ors of nothing but wide ranges (which don't get a FIRST table)
+    wide = compile_rule(CharClassParser.wide).nodes[0].nodes[0].nodes[0]
+    assert wide.table is None
+    assert wide.charclass.ranges == (('\u0100', '\u1fff'), ('\u3000', '\u4000'), ('\u4e00', '\u9fff'))
+    for text in ('\u0100\u3000\u4e2d', iter('\u0100\u3000\u4e2d')):
+        assert parser.parse(CharClassParser.wide, text) == '\u0100\u3000\u4e2d'
+    with pytest.raises(ParseError) as e:
+        parser.parse(CharClassParser.wide, '\u2000')
+    assert len(e.value.expected) == 2
@@ -0,0 +1,66 @@
+"""Incremental reparsing tests"""
+from __future__ import unicode_literals
+
+import json
+import random
+import pytest
+from pegasus.rules import ParseError
+
+from test_json import JsonParser
+
+
+DOC = json.dumps([{'key{}'.format(i): [i, 'value {}'.format(i), True, False]} for i in range(50)])
+
+
+def test_reparse():
+    parser = JsonParser()
+    tree = parser.parse_incremental(JsonParser.document, DOC)
+    assert tree.error is None
+    assert tree.result == json.loads(DOC)
+    assert tree.reused == 0
+
+    # change one of the values in the middle
+    start = DOC.index('value 25')
+    text = DOC[:start] + 'changed' + DOC[start + 5:]
+    edited = parser.reparse(tree, text, start, start + 5)
+    assert edited.result == json.loads(text)
+    assert edited.reused > len(tree.memo) // 2
+
+    # the earlier parse can still be reparsed from
+    text = DOC[:start] + DOC[start + 5:]
+    assert parser.reparse(tree, text, start, start + 5).result == json.loads(text)
+
+
+def test_reparse_errors():
+    parser = JsonParser()
+    tree = parser.parse_incremental(JsonParser.document, '[1, 2, 3]')
+
+    broken = parser.reparse(tree, '[1, 2, , 3]', 6, 6)
+    assert broken.result is None
+    assert isinstance(broken.error, ParseError) and broken.error.position == 7
+
+    fixed = parser.reparse(broken, '[1, 2, 4, 3]', 7, 7)
+    assert fixed.error is None and fixed.result == [1, 2, 4, 3]
+
+    with pytest.raises(ValueError):
+        parser.reparse(tree, '[1]', 5, 20)
+
+
+def test_reparse_random_edits():
+    parser = JsonParser()
+    rand = random.Random(42)
+    pieces = ['1', '23', ', ', '"x"', '[', ']', '{}', 'true', ' ', 'null', '"a": ']
+
+    text = DOC
+    tree = parser.parse_incremental(JsonParser.document, text)
+    for _ in range(100):
+        start = rand.randint(0, len(text))
+        end = min(len(text), start + rand.randint(0, 4))
+        text = text[:start] + rand.choice(pieces) + text[end:]
+        tree = parser.reparse(tree, text, start, end)
+
+        full = parser.parse_incremental(JsonParser.document, text)
+        if full.error is None:
+            assert tree.error is None and tree.result == full.result
+        else:
+            assert tree.error is not None and tree.error.position == full.error.position
@@ -0,0 +1,117 @@
+"""Indexed (backtracking) engine tests"""
+from __future__ import unicode_literals
+
+import json
+import pytest
+from pegasus import Parser, rule
+from pegasus.rules import All, Dot, EOF, In, Opt, ParseError, Plus, Str
+
+from test_basic import SimpleParser
+from test_json import JsonParser
+
+
+def upper(char, parser):
+    """A plain parser generator function"""
+    if char() is None or not char().isupper():
+        raise ParseError(got=char(), expected=['an uppercase letter'])
+    yield (char(),), False
+
+
+class MiscParser(Parser):
+    @rule(Str(Plus(upper)), EOF)
+    def shout(self, text):
+        return text
+
+    @rule(All('ab', Plus(In('abc'))), Dot)
+    def abc(self, *parts):
+        return parts
+
+    @rule(Opt('ab'), 'ac')
+    def backtrack(self, *parts):
+        return parts
+
+    @rule(['ab', 'a'])
+    def prefixed(self, part):
+        return part
+
+
+def test_indexed_matches_streaming():
+    parser = JsonParser()
+
+    for rule_name, text in [
+        ('number', '-1234.5678'),
+        ('number', '1234.'),
+        ('number', '+.1234'),
+        ('string', '"\\\\\\""'),
+        ('value', 'false'),
+        ('array', '[1, 2, \n3, true, false]'),
+        ('array', '[[1],[2, 3]]'),
+        ('object', '{"foo": true, "hello": 12345, "another": [1, 2, 3]}'),
+    ]:
+        rule = getattr(JsonParser, rule_name)
+        assert parser.parse(rule, text, match=False, engine='indexed') == parser.parse(rule, iter(text), match=False)
+
+    doc = json.dumps({'a': [1, 2.5, {'b': 'hello \\n world', 'c': [True, False]}] * 5, 'd': 'x' * 50})
+    assert parser.parse(JsonParser.document, doc, engine='indexed') == parser.parse(JsonParser.document, iter(doc))
+    assert parser.parse(JsonParser.document, doc, packrat=True, engine='indexed') == json.loads(doc)
+
+    parser = SimpleParser()
+    assert 'Josh' == parser.parse(SimpleParser.hello_world, 'hello,     Josh!!!', engine='indexed')
+
+
+def test_indexed_errors():
+    parser = JsonParser()
+
+    with pytest.raises(ParseError) as e:
+        parser.parse(JsonParser.document, '{"foo": [1, 2, }', engine='indexed')
+    assert e.value.got == '}'
+
+    with pytest.raises(ParseError) as e:
+        parser.parse(JsonParser.number, '1234 ', engine='indexed')
+    assert '<EOF>' in e.value.expected
+
+
+def test_indexed_generator_rules():
+    parser = MiscParser()
+    assert parser.parse(MiscParser.shout, 'HEY', engine='indexed') == 'HEY'
+    assert parser.parse(MiscParser.abc, 'abc', match=False, engine='indexed') == ('ab', 'c')
+    assert parser.parse(MiscParser.abc, iter('abc'), match=False) == ('ab', 'c')
+    with pytest.raises(ParseError):
+        parser.parse(MiscParser.shout, 'HEy', engine='indexed')
+
+
+def test_indexed_backtracking():
+    parser = MiscParser()
+    assert parser.parse(MiscParser.backtrack, 'abac', engine='indexed') == ('ab', 'ac')
+    assert parser.parse(MiscParser.backtrack, 'ac', engine='indexed') == ('ac',)
+
+
+def test_streaming_semantics():
+    # the indexed engine gets ordered choice and backtracking...
+    parser = MiscParser()
+    assert parser.parse(MiscParser.prefixed, 'ab', engine='indexed') == 'ab'
+    assert parser.parse(MiscParser.backtrack, 'ac', engine='indexed') == ('ac',)
+
+    # ...while streams, strings included by default, take the first alternative to complete and never rewind
+    for text in ['ab', iter('ab')]:
+        with pytest.raises(ParseError) as e:
+            parser.parse(MiscParser.prefixed, text)
+        assert e.value.position == 1
+    assert parser.parse(MiscParser.prefixed, iter('ab'), match=False) == 'a'
+    with pytest.raises(ParseError):
+        parser.parse(MiscParser.backtrack, 'ac')
+    assert parser.parse(MiscParser.backtrack, iter('abac')) == ('ab', 'ac')
+
+    parser = JsonParser()
+    assert parser.parse(JsonParser.document, '[1,]') == [1]
+    with pytest.raises(ParseError):
+        parser.parse(JsonParser.document, '[1,]', engine='indexed')
+
+
+def test_engine_option():
+    parser = JsonParser()
+    with pytest.raises(ValueError):
+        parser.parse(JsonParser.document, '[1]', engine='packrat')
+    with pytest.raises(ValueError):
+        parser.parse(JsonParser.document, iter('[1]'), engine='indexed')
+    assert list(parser.iterparse(JsonParser.array, '[1][2]', engine='indexed')) == [[1], [2]]
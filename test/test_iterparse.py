@@ -0,0 +1,58 @@
+"""Multi-document parsing tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus import rule
+from pegasus.rules import ParseError
+
+from test_json import JsonParser
+
+
+class NdJsonParser(JsonParser):
+    @rule(JsonParser.ws, JsonParser.value, JsonParser.ws)
+    def entry(self, value):
+        return value
+
+
+DOCS = '{"a": [1, 2]}\n[3]  "four"\n{"five": {}}\n'
+EXPECTED = [{'a': [1, 2]}, [3], 'four', {'five': {}}]
+
+
+def test_iterparse():
+    parser = NdJsonParser()
+    assert list(parser.iterparse(NdJsonParser.entry, DOCS)) == EXPECTED
+    assert list(parser.iterparse(NdJsonParser.entry, iter(DOCS))) == EXPECTED
+    assert list(parser.iterparse(NdJsonParser.entry, iter(DOCS), packrat=True)) == EXPECTED
+    assert list(parser.iterparse(NdJsonParser.entry, DOCS.splitlines(True))) == EXPECTED
+    assert list(parser.iterparse(NdJsonParser.entry, '')) == []
+    assert list(parser.iterparse(NdJsonParser.entry, iter(''))) == []
+
+
+def test_iterparse_chunks():
+    parser = NdJsonParser()
+
+    # many documents to a chunk, numbers ending on the character after them, and
+    # documents split across chunks
+    chunks = ['[1]' * 1000 + '1 2 [', '3] 4', ' ', bytearray(b'"five"[6]')]
+    expected = [[1]] * 1000 + [1, 2, [3], 4, b'five', [6]]
+    assert list(parser.iterparse(NdJsonParser.entry, chunks)) == expected
+
+
+def test_iterparse_is_lazy():
+    def stream():
+        while True:
+            yield '[1] '
+
+    parser = NdJsonParser()
+    results = parser.iterparse(NdJsonParser.entry, stream())
+    assert [next(results) for _ in range(100)] == [[1]] * 100
+
+
+def test_iterparse_errors():
+    parser = NdJsonParser()
+
+    for text in ['[1] [2 ', iter('[1] [2 ')]:
+        results = parser.iterparse(NdJsonParser.entry, text)
+        assert next(results) == [1]
+        with pytest.raises(ParseError):
+            next(results)
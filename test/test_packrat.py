@@ -0,0 +1,44 @@
+"""Packrat parsing tests"""
+from __future__ import unicode_literals
+
+import json
+from pegasus.memo import MemoTable
+
+from test_basic import SimpleParser
+from test_json import JsonParser
+
+
+def test_memo_table_lru():
+    memo = MemoTable(2)
+    memo.put('a', 0, 1)
+    memo.put('b', 0, 2)
+    assert memo.get('a', 0) == 1
+    memo.put('c', 0, 3)
+    assert len(memo) == 2
+    assert memo.get('b', 0) is None
+    assert memo.get('a', 0) == 1
+    assert memo.get('c', 0) == 3
+
+
+def test_memo_table_commit():
+    memo = MemoTable()
+    memo.put('a', 0, 1)
+    memo.put('a', 1, 2)
+    memo.put('b', 2, 3)
+    memo.commit(2)
+    assert len(memo) == 1
+    assert memo.get('b', 2) == 3
+
+
+def test_packrat_parse():
+    parser = SimpleParser()
+    assert 'Paul' == parser.parse(SimpleParser.hello_world, 'hello, Paul!', packrat=True)
+
+    parser = JsonParser()
+    assert parser.parse(JsonParser.number, '-1234.5678', match=False, packrat=True) == -1234.5678
+    assert parser.parse(JsonParser.number, '.1234', match=False, packrat=True, memo_size=1) == 0.1234
+
+    doc = json.dumps({'a': [1, 2.5, {'b': 'hello \\n world', 'c': [True, False]}] * 5, 'd': 'x' * 50})
+    expected = parser.parse(JsonParser.document, doc)
+    assert parser.parse(JsonParser.document, doc, packrat=True) == expected
+    assert parser.parse(JsonParser.document, doc, packrat=True, memo_size=4) == expected
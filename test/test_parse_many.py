@@ -0,0 +1,38 @@
+"""Process pool batch parsing tests"""
+from __future__ import unicode_literals
+
+import json
+import pytest
+from pegasus.parser import NotARuleException
+from pegasus.rules import ParseError
+
+from test_basic import SimpleParser
+from test_json import JsonParser
+
+
+DOCS = ['[{}]'.format(', '.join(str(j) for j in range(i))) for i in range(50)]
+
+
+def test_parse_many():
+    parser = JsonParser()
+    expected = [json.loads(doc) for doc in DOCS]
+
+    assert list(parser.parse_many(JsonParser.document, DOCS, workers=2)) == expected
+    assert list(parser.parse_many(JsonParser.document, DOCS, workers=2, chunksize=8)) == expected
+
+    results = sorted(parser.parse_many(JsonParser.document, DOCS, workers=2, ordered=False))
+    assert [i for i, _ in results] == list(range(len(DOCS)))
+    assert [result for _, result in results] == expected
+
+
+def test_parse_many_errors():
+    parser = JsonParser()
+    results = parser.parse_many(JsonParser.document, ['[1]', '[1, ]'], workers=2, engine='indexed')
+    assert next(results) == [1]
+
+    with pytest.raises(ParseError) as e:
+        next(results)
+    assert e.value.position == 4
+
+    with pytest.raises(NotARuleException):
+        parser.parse_many(SimpleParser.hello_world, ['hello, Paul'])
@@ -0,0 +1,86 @@
+"""Profiler tests"""
+from __future__ import unicode_literals
+
+import json
+import threading
+from pegasus.profile import Profiler
+from pegasus.rules import compile_rule
+
+from test_json import JsonParser
+
+
+DOC = '{"foo": [1, 2, {"bar": "baz"}], "qux": true}'
+
+
+def test_profile():
+    parser = JsonParser()
+    profiler = Profiler()
+    assert parser.parse(JsonParser.document, DOC, tracer=profiler, engine='indexed') == json.loads(DOC)
+
+    report = profiler.report()
+    json.dumps(report)
+
+    assert report['document']['calls'] == 1
+    assert report['document']['successes'] == 1
+    assert report['document']['chars'] == len(DOC)
+    assert report['object']['calls'] == 2
+    assert report['number']['successes'] == 2
+    assert report['bool_literal']['successes'] == 1
+    assert report['true_literal']['chars'] == 4
+    assert report['value']['time'] <= report['document']['time']
+
+    total = sum(stats['self_time'] for stats in report.values())
+    assert total <= report['document']['time'] * 1.01 + 1e-3
+
+    table = profiler.table(sort='calls', limit=5)
+    assert len(table.splitlines()) == 6
+    assert 'document' in profiler.table()
+
+
+def test_profile_streaming():
+    parser = JsonParser()
+    profiler = Profiler()
+    assert parser.parse(JsonParser.document, iter(DOC), tracer=profiler) == json.loads(DOC)
+
+    report = profiler.report()
+    assert report['document']['calls'] == 1
+    assert report['document']['successes'] == 1
+    assert report['object']['successes'] == 2
+
+
+def test_profiler_leaves_graph():
+    node = compile_rule(JsonParser.document)
+    classes = dict((child, type(child)) for child in _nodes(node))
+    parser = JsonParser()
+    profiler = Profiler()
+
+    def run():
+        for _ in range(20):
+            assert parser.parse(JsonParser.document, DOC, tracer=profiler, engine='indexed') == json.loads(DOC)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # parses without the profiler run on the original graph, and don't get counted
+    assert parser.parse(JsonParser.document, DOC) == json.loads(DOC)
+    for thread in threads:
+        thread.join()
+
+    assert dict((child, type(child)) for child in _nodes(node)) == classes
+    assert not any(hasattr(child, '_profiler') for child in classes)
+
+    report = profiler.report()
+    assert report['document']['calls'] == 80
+    assert report['object']['calls'] == 160
+    assert report['true_literal']['chars'] == 80 * 4
+
+
+def _nodes(root):
+    seen = set()
+    pending = [root]
+    while len(pending):
+        node = pending.pop()
+        if node not in seen:
+            seen.add(node)
+            pending += node.nodes
+    return seen
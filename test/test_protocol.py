@@ -0,0 +1,60 @@
+"""Event loop protocol tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus.protocol import ParseProtocol
+from pegasus.rules import ParseError
+
+from test_json import JsonParser
+
+
+class Transport(object):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_protocol():
+    results = []
+    protocol = ParseProtocol(JsonParser(), JsonParser.document, results.append)
+    protocol.connection_made(Transport())
+
+    for chunk in ['{"foo": ', '[1, 2', ']}', ' ']:
+        protocol.data_received(chunk)
+        assert results == []
+
+    protocol.eof_received()
+    assert results == [{'foo': [1, 2]}]
+
+    # completes as soon as the rule does without `match`
+    results = []
+    protocol = ParseProtocol(JsonParser(), JsonParser.array, results.append, match=False)
+    protocol.data_received('[1')
+    protocol.data_received('] [2]')
+    assert results == [[1]]
+    protocol.connection_lost(None)
+    assert results == [[1]]
+
+
+def test_protocol_errors():
+    errors = []
+    transport = Transport()
+    protocol = ParseProtocol(JsonParser(), JsonParser.document, None, errors.append)
+    protocol.connection_made(transport)
+    protocol.data_received('[1, ')
+    protocol.data_received('2 3]')
+    assert len(errors) == 1
+    assert errors[0].got == '3'
+    assert transport.closed
+
+    protocol = ParseProtocol(JsonParser(), JsonParser.document, None)
+    protocol.data_received('[1, ')
+    with pytest.raises(ParseError):
+        protocol.eof_received()
+
+    lost = IOError('connection reset')
+    protocol = ParseProtocol(JsonParser(), JsonParser.document, None, errors.append)
+    protocol.data_received('[1, ')
+    protocol.connection_lost(lost)
+    assert errors[-1] is lost
@@ -0,0 +1,128 @@
+"""Regex-accelerated terminal scanning tests"""
+from __future__ import unicode_literals
+
+import pytest
+from functools import partial
+from pegasus import Parser, rule
+from pegasus.codegen import compile_grammar
+from pegasus.rules import ChrRange as C, Discard, Dot, EOF, In, Opt, Or, ParseError, Plus, Seq, Star, Str, compile_rule
+
+from test_json import JsonParser
+
+
+class ScanParser(Parser):
+    @rule(Str([C['a':'z'], C['A':'Z'], '_'], Star([C['a':'z'], C['A':'Z'], C['0':'9'], '_'])))
+    def identifier(self, name):
+        return name
+
+    @rule(Discard(Star(In(' \t'))), identifier, Discard(Star(In(' \t'))), EOF)
+    def statement(self, name):
+        return name
+
+    @rule(Str(Plus('a'), 'a'))
+    def greedy(self, text):
+        return text
+
+    @rule(Str(Opt('ab'), 'ac'))
+    def optional(self, text):
+        return text
+
+    @rule(Plus(In('xyz')))
+    def chars(self, *chars):
+        return chars
+
+    @rule(Str(Plus(Dot)))
+    def anything(self, text):
+        return text
+
+    @rule(Discard(Plus(Seq(C['a':'c'], 'ba', 'b'))), EOF)
+    def repeated(self):
+        return ()
+
+    @rule(Str(['if', 'else', 'elif', 'while']), Discard(Opt(' ')))
+    def keyword(self, name):
+        return name
+
+
+def test_scanners_are_compiled():
+    assert compile_rule(ScanParser.identifier).nodes[0].scanner is not None
+    assert compile_rule(ScanParser.chars).nodes[0].scanner is not None
+
+
+def test_scanning():
+    def indexed(rule, text):
+        return ScanParser().parse(rule, text, engine='indexed')
+
+    def stream(rule, text):
+        return ScanParser().parse(rule, iter(text), match=False)
+
+    for parse in [indexed, stream]:
+        assert parse(ScanParser.statement, '  hello_World2 ') == 'hello_World2'
+        assert parse(ScanParser.chars, 'xyzzy') == (('x',), ('y',), ('z',), ('z',), ('y',))
+        assert parse(ScanParser.anything, 'any\nthing') == 'any\nthing'
+
+    grammar = compile_grammar(ScanParser)
+    assert grammar.parse(ScanParser(), 'statement', '\thello_World2') == 'hello_World2'
+    assert grammar.parse(ScanParser(), 'chars', 'zx') == (('z',), ('x',))
+
+
+def test_scanning_keeps_peg_semantics():
+    parser = ScanParser()
+    grammar = compile_grammar(ScanParser)
+
+    # Plus() never gives anything back, so the trailing 'a' can't ever match
+    with pytest.raises(ParseError):
+        parser.parse(ScanParser.greedy, 'aaa', engine='indexed')
+    with pytest.raises(ParseError):
+        grammar.parse(parser, 'greedy', 'aaa')
+
+    assert parser.parse(ScanParser.optional, 'abac', engine='indexed') == 'abac'
+    assert grammar.parse(parser, 'optional', 'ac') == 'ac'
+
+
+def test_scanning_errors():
+    with pytest.raises(ParseError) as e:
+        ScanParser().parse(ScanParser.statement, '  9lives', engine='indexed')
+    assert e.value.got == '9'
+
+
+def _generated(grammar, parser, rule, text):
+    return grammar.parse(parser, rule.__name__, text)
+
+
+def test_scanning_errors_past_the_scan():
+    # what ended a scanned run counts towards the error, as if it were matched rule by rule
+    parser = ScanParser()
+    grammar = compile_grammar(ScanParser)
+    for parse in [partial(parser.parse, engine='indexed'), partial(_generated, grammar, parser)]:
+        with pytest.raises(ParseError) as e:
+            parse(ScanParser.repeated, 'bbabb')
+        assert e.value.position == 5
+        assert e.value.expected == [repr('ba')]
+
+    parser = JsonParser()
+    grammar = compile_grammar(JsonParser)
+    for parse in [partial(parser.parse, engine='indexed'), partial(_generated, grammar, parser)]:
+        with pytest.raises(ParseError) as e:
+            parse(JsonParser.document, '{u}')
+        assert e.value.position == 1
+        assert len(e.value.expected) == 3
+
+
+def test_scanning_puts_off_reruns(monkeypatch):
+    # a scanned Or() is only rerun to find out what ended it if the parse fails
+    calls = []
+    match = Or.match
+    monkeypatch.setattr(Or, 'match', lambda self, context, pos: calls.append(pos) or match(self, context, pos))
+
+    parser = ScanParser()
+    assert parser.parse(ScanParser.keyword, 'while ', engine='indexed') == 'while'
+    assert calls == []
+
+    grammar = compile_grammar(ScanParser)
+    for parse in [partial(parser.parse, engine='indexed'), partial(_generated, grammar, parser)]:
+        with pytest.raises(ParseError) as e:
+            parse(ScanParser.keyword, 'elsewhere')
+        assert e.value.position == 4
+        assert sorted(e.value.expected) == sorted([repr(' '), '<EOF>'])
+    assert calls == [0]
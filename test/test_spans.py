@@ -0,0 +1,95 @@
+"""Span capture tests"""
+from __future__ import unicode_literals
+
+import pytest
+from pegasus import Parser, rule
+from pegasus.codegen import compile_grammar
+from pegasus.rules import ChrRange as C, Capture, Discard, In, Plus, Span, Star, Str, BadRuleException
+
+
+class SpanParser(Parser):
+    @rule(Capture(C['a':'z'], Star([C['a':'z'], C['0':'9']])))
+    def identifier(self, name):
+        return name
+
+    @rule(Discard(Star(' ')), Capture(Plus(identifier, Discard(Star(' ')))))
+    def identifiers(self, names):
+        return names
+
+    @rule(Discard('"'), Str(Star(In('"', True)), span=True), Discard('"'))
+    def string(self, contents):
+        return contents
+
+    @rule(Str(Capture('a'), Discard('b'), 'c'))
+    def nested(self, text):
+        return text
+
+    @rule(Capture('a', Discard('b'), 'c'))
+    def discarded(self, span):
+        return span
+
+
+def test_spans():
+    parser = SpanParser()
+
+    span = parser.parse(SpanParser.identifier, 'abc123')
+    assert isinstance(span, Span)
+    assert (span.start, span.end, len(span)) == (0, 6, 6)
+    assert span.value == 'abc123'
+    assert span == 'abc123'
+
+    span = parser.parse(SpanParser.identifiers, '  foo bar  ')
+    assert (span.start, span.end) == (2, 11)
+    assert span.value == 'foo bar  '
+
+    span = parser.parse(SpanParser.string, '"hello there"')
+    assert (span.start, span.end) == (1, 12)
+    assert span.value == 'hello there'
+
+    with pytest.raises(BadRuleException):
+        Str('a', spam=True)
+
+
+def test_spans_streaming():
+    parser = SpanParser()
+
+    span = parser.parse(SpanParser.string, iter('"hello there"'))
+    assert (span.start, span.end) == (1, 12)
+    assert span.value == 'hello there'
+
+    # the span covers the input the rules discarded as well
+    span = parser.parse(SpanParser.discarded, iter('abc'))
+    assert (span.start, span.end, span.value) == (0, 3, 'abc')
+    assert parser.parse(SpanParser.discarded, 'abc') == span
+    assert compile_grammar(SpanParser).parse(parser, 'discarded', 'abc') == span
+
+    span = parser.parse(SpanParser.identifiers, iter('  foo bar  '))
+    assert (span.start, span.end, span.value) == (2, 11, 'foo bar  ')
+
+
+def test_spans_codegen():
+    grammar = compile_grammar(SpanParser)
+
+    span = grammar.parse(SpanParser(), 'identifiers', '  foo bar  ')
+    assert (span.start, span.end) == (2, 11)
+    assert span.value == 'foo bar  '
+
+    span = grammar.parse(SpanParser(), 'identifier', 'abc123')
+    assert (span.start, span.end) == (0, 6)
+
+
+def test_nested_spans():
+    parser = SpanParser()
+    for text in ('abc', iter('abc'), bytearray(b'abc')):
+        assert parser.parse(SpanParser.nested, text) == 'ac'
+    assert compile_grammar(SpanParser).parse(parser, 'nested', 'abc') == 'ac'
+
+
+def test_spans_file(tmpdir):
+    path = tmpdir.join('names.txt')
+    path.write('  foo bar1  ')
+
+    span = SpanParser().parse_file(SpanParser.identifiers, str(path))
+    assert span.value == b'foo bar1  '
+    assert span == b'foo bar1  '
+    assert hash(span) == hash(b'foo bar1  ')
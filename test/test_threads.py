@@ -0,0 +1,92 @@
+"""Concurrent parsing tests"""
+from __future__ import unicode_literals
+
+import json
+import threading
+import pegasus.rules
+from multiprocessing.pool import ThreadPool
+from pegasus import Parser, rule
+from pegasus.codegen import compile_grammar
+from pegasus.rules import ChrRange as C, Discard, Lazy, ParseError, Plus, Star, Str, compile_rule
+
+from test_json import JsonParser
+
+
+DOCS = ['[{}]'.format(', '.join('{{"key": [{}, "{}"]}}'.format(j, 'x' * j) for j in range(i))) for i in range(0, 40, 4)]
+BAD = ['[1, 2, {}]'.format(', ' * i) for i in range(0, 10, 3)]
+
+
+def _parse(job):
+    parser, doc, options = job
+    kind = options.get('kind')
+    options = dict((key, value) for key, value in options.items() if key != 'kind')
+    try:
+        if kind == 'stream':
+            return parser.parse(JsonParser.document, iter(doc), **options)
+        if kind == 'codegen':
+            return compile_grammar(JsonParser).parse(parser, 'document', doc)
+        return parser.parse(JsonParser.document, doc, **options)
+    except ParseError as e:
+        return e.position
+
+
+def test_shared_parser():
+    parser = JsonParser()
+    options = [{}, {'packrat': True}, {'packrat': True, 'memo_size': 16}, {'kind': 'stream'}, {'kind': 'codegen'}]
+    jobs = [(parser, doc, option) for doc in DOCS + BAD for option in options] * 4
+
+    expected = [_parse(job) for job in jobs]
+    assert expected[:len(options)] == [json.loads(DOCS[0])] * len(options)
+
+    pool = ThreadPool(8)
+    try:
+        assert pool.map(_parse, jobs, chunksize=1) == expected
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _grammar():
+    class WordsParser(Parser):
+        @rule(Plus(Lazy('word'), Discard(Star(' '))))
+        def words(self, *words):
+            return [word for word, in words]
+
+        @rule(Str(Plus([C['a':'z'], C['A':'Z']])))
+        def word(self, word):
+            return word
+
+    return WordsParser
+
+
+def test_concurrent_compile():
+    # the first parses of a grammar compile it; they must all see it compiled in full
+    for _ in range(10):
+        grammar = _grammar()
+        start = threading.Event()
+
+        def parse(text):
+            start.wait()
+            return grammar().parse(grammar.words, text)
+
+        pool = ThreadPool(8)
+        try:
+            results = pool.map_async(parse, ['hello world', 'foo Bar baz'] * 8, chunksize=1)
+            start.set()
+            assert results.get(10) == [['hello', 'world'], ['foo', 'Bar', 'baz']] * 8
+        finally:
+            pool.close()
+            pool.join()
+
+
+def test_compiled_rules_skip_the_lock(monkeypatch):
+    grammar = _grammar()
+    node = compile_rule(grammar.words)
+
+    class Locked(object):
+        def __enter__(self):
+            raise AssertionError('compile_rule() took the lock for a compiled rule')
+
+    monkeypatch.setattr(pegasus.rules, '_COMPILING', Locked())
+    assert compile_rule(grammar.words) is node
+    assert grammar().parse(grammar.words, 'hello world') == ['hello', 'world']
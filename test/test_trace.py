@@ -0,0 +1,76 @@
+"""Tracer tests"""
+from __future__ import unicode_literals
+
+import io
+from pegasus.rules import compile_rule, set_debug
+from pegasus.trace import PrintTracer, Tracer, traced
+
+from test_json import JsonParser
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.events = []
+
+    def enter(self, rule, pos):
+        self.events.append(('enter', repr(rule), pos))
+
+    def result(self, rule, pos, end, result):
+        self.events.append(('result', repr(rule), pos, end))
+
+    def fail(self, rule, pos):
+        self.events.append(('fail', repr(rule), pos))
+
+    def exit(self, rule, pos):
+        self.events.append(('exit', repr(rule), pos))
+
+
+def test_trace():
+    parser = JsonParser()
+
+    for text in ['[1, true]', iter('[1, true]')]:
+        tracer = RecordingTracer()
+        assert parser.parse(JsonParser.document, text, tracer=tracer) == [1, True]
+
+        events = tracer.events
+        assert events[0] == ('enter', 'document', 0)
+        assert ('result', 'true_literal', 4, 8) in events
+        assert ('fail', "u','", 8) in events
+        assert events[-1] == ('exit', 'document', 0)
+        assert len([e for e in events if e[0] == 'enter']) == len([e for e in events if e[0] == 'exit'])
+
+
+def test_trace_per_instance():
+    parser = JsonParser()
+    parser.tracer = RecordingTracer()
+    assert parser.parse(JsonParser.array, '[]') == []
+    assert ('result', 'array', 0, 2) in parser.tracer.events
+
+    # a parse's own tracer takes precedence
+    tracer = RecordingTracer()
+    events = len(parser.tracer.events)
+    parser.parse(JsonParser.array, '[]', tracer=tracer)
+    assert len(parser.tracer.events) == events
+    assert len(tracer.events)
+
+
+def test_untraced_graph():
+    node = compile_rule(JsonParser.document)
+    assert traced(node) is traced(node)
+    assert traced(node) is not node
+    assert type(node).match is not type(traced(node)).match
+
+
+def test_set_debug(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr('pegasus.parser.PrintTracer', lambda: PrintTracer(stream))
+
+    set_debug()
+    try:
+        JsonParser().parse(JsonParser.array, '[]')
+    finally:
+        set_debug(False)
+
+    assert 'pegasus: enter array @ 0' in stream.getvalue()
+    JsonParser().parse(JsonParser.array, '[]')
+    assert stream.getvalue().count('enter array') == 1